@@ -1,14 +1,106 @@
 import math
-import copy
+import multiprocessing
 import random
-from board import InvalidMoveException, PowerUp
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, wait
+from board import PowerUp, InvalidMoveException
+from piece import ALL_PIECES, TILE_COPIES
+from mcts import MCTS
+from opening_book import default_book
+
+class SearchAborted(Exception):
+    """Raised inside the hard search when its time or node budget runs out."""
+
+
+# transposition table bound types
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+class TranspositionTable:
+    """
+    Search results by position key, evicting the least recently used entry
+    once max_entries is reached (0 disables the table). An entry is (value, depth, bound, best_move)
+    with best_move as (row, col, piece).
+    """
+    def __init__(self, max_entries=200000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+        return entry
+
+    def store(self, key, value, depth, bound, best_move):
+        entries = self.entries
+        if self.max_entries <= 0:
+            return
+        if key in entries:
+            entries.move_to_end(key)
+        elif len(entries) >= self.max_entries:
+            entries.popitem(last=False)
+        entries[key] = (value, depth, bound, best_move)
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+
 
 class QwirkleAI:
-    def __init__(self, name="QwirkleAI", difficulty="hard", max_depth=3):
+    # extra value for landing on a power-up cell
+    POWERUP_BONUS = {PowerUp.WILD: 20, PowerUp.DOUBLE: 15, PowerUp.UNDO: 10}
+
+    # on an empty board every kind fits every cell and cells away from the edges are alike,
+    # so openings are only tried this many rows/columns around the centre (all of a 6x6 board)
+    OPENING_RADIUS = 3
+
+    # root moves each worker gets per batch in parallel mode
+    ROOT_CHUNK = 2
+
+    def __init__(self, name="QwirkleAI", difficulty="hard", max_depth=3, tt_size=200000, time_ms=None, workers=0,
+                 iterations=1000, seed=None, ordering=True, book=True):
         self.name = name
         self.difficulty = difficulty.lower()
         self.max_depth = max_depth
+        # default per-move budget for the hard and medium searches (None: search everything)
+        self.time_ms = time_ms
+        # workers > 1 splits the hard search's root moves over a process pool
+        self.workers = workers
+        self._executor = None
+        # set to stop the pool's searches when the turn is cancelled
+        self._stop = None
+        # mcts: iterations per move (time_ms also applies) and its random deals
+        self.iterations = iterations
+        self.rng = random.Random(seed)
         self.tiles = []
+        # medium: rest of the planned turn as (board hash before, move); a None move ends the turn
+        self._plan = []
+        self._deadline = None
+        self._max_nodes = None
+        self._cancel = None
+        # turns worked out by ponder(), by (board hash, rack)
+        self._pondered = {}
+        # kept for the whole game: choose_move runs once per tile placed
+        self.tt = TranspositionTable(tt_size)
+        # off for searches that can fire an UNDO power-up; see _uses_tt
+        self._use_tt = True
+        # move ordering: killer moves per ply and cutoff history per (cell, tile kind)
+        self.ordering = ordering
+        self._killers = {}
+        self._history = {}
+        self._root_depth = 0
+        # nodes visited, alpha-beta cutoffs and root value of the last hard search
+        self.search_stats = {"nodes": 0, "cutoffs": 0, "value": None}
+        # hard and mcts play book moves on near-empty boards: True for the shipped
+        # opening_book.json, or an OpeningBook, or None for no book
+        self.book = default_book() if book is True else book
 
     def set_tiles(self, tiles):
         self.tiles = tiles
@@ -16,117 +108,547 @@ class QwirkleAI:
     def get_tiles(self):
         return self.tiles
 
-    def choose_move(self, board):
+    def take_turn(self, board, cancel=None):
+        """
+        Plays a whole turn on a copy of board and returns its moves as
+        (row, col, piece) in order, or None if `cancel` (a threading.Event)
+        got set. Neither board nor the rack is touched, so the UI can run this
+        on a worker thread while it keeps drawing. A turn already worked out by
+        ponder() for this position and rack is returned at once.
+        """
+        moves = self._pondered.pop(self._ponder_key(board), None)
+        # the real position is here, so the other predictions are stale
+        self._pondered.clear()
+        if moves is not None:
+            return list(moves)
+        return self._play_turn(board, cancel)
+
+    def _play_turn(self, board, cancel):
+        board = board.clone()
+        tiles = self.tiles
+        self.tiles = list(tiles)
+        self._cancel = cancel
+        moves = []
+        try:
+            while not (cancel and cancel.is_set()):
+                move = self.choose_move(board)
+                if not move:
+                    break
+                r, c, i = move
+                piece = self.tiles.pop(i)
+                try:
+                    board.apply((r, c, piece))
+                except InvalidMoveException:
+                    break
+                moves.append((r, c, piece))
+        except SearchAborted:
+            pass
+        finally:
+            self.tiles = tiles
+            self._cancel = None
+        if cancel and cancel.is_set():
+            return None
+        return moves
+
+    def ponder(self, board, cancel=None, replies=6):
+        """
+        Uses the opponent's thinking time: works out our next turn for the
+        positions we are most likely to get, namely the opponent ending their
+        turn as it stands, then after an extra tile on each of their `replies`
+        best scoring cells (the fitting kind with the most unseen copies). take_turn then answers
+        those positions at once, and the hard search keeps every
+        transposition entry made here. Positions pondered earlier in the same
+        turn are kept. Stops as soon as cancel is set.
+        """
+        board = board.clone()
+        turn = board.apply_end_turn()
+        self._ponder_position(board, cancel)
+        board.undo(turn)
+
+        # one reply per cell, best scoring cells first; on each cell the kinds
+        # that fit its lines, commonest among the unseen tiles first
+        pool = self.unseen_tiles(board)
+        kinds = list(pool)
+        fits = {}
+        for r, c, i in board.get_rack_moves(kinds, self.OPENING_RADIUS):
+            fits.setdefault((r, c), []).append(kinds[i])
+        candidates = []
+        for (r, c), pieces in fits.items():
+            score = board.placement_score(r, c)
+            pieces.sort(key=lambda p: -pool[p])
+            candidates.extend((k, -score, r, c, piece) for k, piece in enumerate(pieces))
+        candidates.sort(key=lambda m: m[:2])
+        for _, _, r, c, piece in candidates[:replies]:
+            if cancel and cancel.is_set():
+                break
+            token = board.apply((r, c, piece))
+            turn = board.apply_end_turn()
+            self._ponder_position(board, cancel)
+            board.undo(turn)
+            board.undo(token)
+
+    def _ponder_position(self, board, cancel):
+        key = self._ponder_key(board)
+        if key in self._pondered or (cancel and cancel.is_set()):
+            return
+        moves = self._play_turn(board, cancel)
+        if moves is not None:
+            self._pondered[key] = moves
+
+    def _ponder_key(self, board):
+        return (board.zobrist_hash, tuple(sorted(p.id for p in self.tiles)))
+
+    def close(self):
+        """Shut down the worker pool of parallel mode, if one was started."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+            self._stop = None
+
+    def choose_move(self, board, time_ms=None, max_nodes=None):
+        if self.book and self.difficulty in ("hard", "mcts"):
+            move = self.book.lookup(board, self.tiles)
+            if move is not None:
+                return move
         if self.difficulty == "easy":
             return self.choose_move_easy(board)
         elif self.difficulty == "medium":
-            return self.choose_move_medium(board)
+            return self.choose_move_medium(board, time_ms, max_nodes)
         elif self.difficulty == "hard":
-            return self.choose_move_hard(board)
+            return self.choose_move_hard(board, time_ms, max_nodes)
+        elif self.difficulty == "mcts":
+            return self.choose_move_mcts(board, time_ms)
         else:
             return self.choose_move_easy(board)
 
     def choose_move_easy(self, board):
-        for r in range(board.grid.rows):
-            for c in range(board.grid.cols):
-                for i, tile in enumerate(self.tiles):
-                    temp_board = copy.deepcopy(board)
-                    try:
-                        if self._is_adjacent_valid(r, c, temp_board):
-                            temp_board.place_piece(r, c, tile)
-                            return (r, c, i)
-                    except InvalidMoveException:
-                        continue
+        for r, c, i in board.get_rack_moves(self.tiles, self.OPENING_RADIUS):
+            if self._is_adjacent_valid(r, c, board):
+                return (r, c, i)
         return None
 
-    def choose_move_medium(self, board):
-        best_move = None
-        best_score = -math.inf
-
-        for r in range(board.grid.rows):
-            for c in range(board.grid.cols):
-                for i, tile in enumerate(self.tiles):
-                    temp_board = copy.deepcopy(board)
-                    try:
-                        if self._is_adjacent_valid(r, c, temp_board):
-                            temp_board.place_piece(r, c, tile)
-                            score = temp_board.score_current_turn()
-
-                            if board.get_powerup_at(r, c):
-                                powerup = board.get_powerup_at(r, c)
-                                if powerup == PowerUp.WILD:
-                                    score += 20
-                                elif powerup == PowerUp.DOUBLE:
-                                    score += 15
-                                elif powerup == PowerUp.UNDO:
-                                    score += 10
-
-                            if score > best_score:
-                                best_score = score
-                                best_move = (r, c, i)
-                    except InvalidMoveException:
-                        continue
-        return best_move
+    def choose_move_medium(self, board, time_ms=None, max_nodes=None):
+        # plays the best whole turn, one tile per call
+        plan = self._plan
+        if not (plan and plan[0][0] == board.zobrist_hash and (plan[0][1] is None or plan[0][1][2] in self.tiles)):
+            plan = self._plan = self.plan_turn(board, time_ms, max_nodes)[1]
+        if not plan:
+            return None
+        _, move = plan.pop(0)
+        if move is None:
+            return None
+        r, c, piece = move
+        return (r, c, self.tiles.index(piece))
+
+    def plan_turn(self, board, time_ms=None, max_nodes=None):
+        """
+        Best complete turn from this position: every sequence of rack tiles
+        along one line through the turn's first tile is tried depth-first on
+        the board itself, so each prefix is applied once and shared by all its
+        extensions, and tile orders that reach the same position are only
+        expanded once. With a time (ms) or node budget, or once the turn is
+        cancelled, it stops early with the best turn found so far.
+        Returns (value, plan): value is the turn score plus POWERUP_BONUS for
+        power-ups picked up, plan a list of (board hash before, (row, col, piece))
+        ending with (final hash, None). A turn already under way may be best
+        left as is, giving just the end marker.
+        """
+        self.search_stats = {"nodes": 0, "value": None}
+        if board.current_turn_moves:
+            best = [board.score_current_turn(), [(board.zobrist_hash, None)]]
+        else:
+            best = [-math.inf, []]
+        if time_ms is None:
+            time_ms = self.time_ms
+        self._deadline = time.perf_counter() + time_ms / 1000 if time_ms is not None else None
+        self._max_nodes = max_nodes
+        try:
+            self._extend_turn(board, list(self.tiles), 0, [], {board.zobrist_hash}, best)
+        except SearchAborted:
+            pass
+        finally:
+            self._deadline = self._max_nodes = None
+        self.search_stats["value"] = best[0]
+        return best[0], best[1]
 
-    def choose_move_hard(self, board):
-        all_moves = []
-        for r in range(board.grid.rows):
-            for c in range(board.grid.cols):
-                for i, tile in enumerate(self.tiles):
-                    temp_board = copy.deepcopy(board)
-                    try:
-                        if self._is_adjacent_valid(r, c, temp_board):
-                            temp_board.place_piece(r, c, tile)
-                            immediate_score = temp_board.score_current_turn()
-                            all_moves.append((r, c, i, immediate_score))
-                    except InvalidMoveException:
-                        continue
-
-        if not all_moves:
+    def _extend_turn(self, board, rack, bonus, path, seen, best):
+        if self._deadline is not None or self._max_nodes is not None or self._cancel is not None:
+            self._check_budget()
+        line = self._line_cells(board)
+        for r, c, i in board.get_rack_moves(rack, self.OPENING_RADIUS):
+            if line is not None and (r, c) not in line:
+                continue
+            if not self._is_adjacent_valid(r, c, board):
+                continue
+            piece = rack[i]
+            before = board.zobrist_hash
+            token = board.apply((r, c, piece))
+            try:
+                if board.zobrist_hash not in seen:
+                    seen.add(board.zobrist_hash)
+                    self.search_stats["nodes"] += 1
+                    gain = bonus + self.POWERUP_BONUS.get(token.powerup, 0)
+                    path.append((before, (r, c, piece)))
+                    value = board.score_current_turn() + gain
+                    if value > best[0]:
+                        best[0] = value
+                        best[1] = path + [(board.zobrist_hash, None)]
+                    self._extend_turn(board, rack[:i] + rack[i+1:], gain, path, seen, best)
+                    path.pop()
+            finally:
+                board.undo(token)
+
+    def _line_cells(self, board):
+        """
+        Empty cells at both ends of the line through the turn's first tile: on
+        every axis while it is the only one, then on the axis the turn's tiles
+        share. None before the turn's first tile.
+        """
+        turn = board.current_turn_moves
+        if not turn:
             return None
+        r0, c0 = turn[0][0], turn[0][1]
+        cells = set()
+        for axis in range(len(board.AXES)):
+            seg = board.segments.segment_at(axis, r0, c0)
+            if any((r, c) not in seg.cells for r, c, _ in turn[1:]):
+                continue
+            for side, end in ((0, seg.cells[0]), (1, seg.cells[-1])):
+                step = board.grid.get_steps(*end)[2*axis + side]
+                if step and not board.grid.is_occupied(*step):
+                    cells.add(step)
+        return cells
 
-        best_move = None
-        best_value = -math.inf
+    def choose_move_mcts(self, board, time_ms=None):
+        if time_ms is None:
+            time_ms = self.time_ms
+        mcts = MCTS(rng=self.rng, opening_radius=self.OPENING_RADIUS)
+        stop = self._cancel.is_set if self._cancel else None
+        move, self.search_stats = mcts.search(board, self.tiles, self.unseen_tiles(board), self._is_adjacent_valid,
+                                              self.iterations, time_ms, stop)
+        if move is None:
+            return None
+        r, c, piece = move
+        return (r, c, self.tiles.index(piece))
+
+    def choose_move_hard(self, board, time_ms=None, max_nodes=None):
+        """
+        Alpha-beta search to max_depth. With a time (ms) or node budget it
+        deepens one ply at a time instead and returns the best move of the
+        deepest iteration that finished inside the budget.
+        """
+        self.search_stats = {"nodes": 0, "cutoffs": 0, "tt_hits": 0, "value": None, "depth": 0}
+        moves = [m for m in board.get_rack_moves(self.tiles, self.OPENING_RADIUS)
+                 if self._is_adjacent_valid(m[0], m[1], board)]
+        if not moves:
+            return None
+        self._age_history()
+        self._use_tt = self._uses_tt(board)
+
+        if time_ms is None:
+            time_ms = self.time_ms
+        if time_ms is None and max_nodes is None:
+            return self._search_root(board, moves, self.max_depth)
 
-        for (r, c, tile_index, _) in all_moves:
-            temp_board = copy.deepcopy(board)
-            temp_board.place_piece(r, c, self.tiles[tile_index])
-            value = self._minimax(temp_board, depth=self.max_depth, alpha=-math.inf, beta=math.inf, maximizing=False)
-            if value > best_value:
-                best_value = value
-                best_move = (r, c, tile_index)
+        self._deadline = time.perf_counter() + time_ms / 1000 if time_ms is not None else None
+        self._max_nodes = max_nodes
+        best_move = moves[0]
+        try:
+            for depth in range(1, self.max_depth + 1):
+                best_move = self._search_root(board, moves, depth)
+        except SearchAborted:
+            pass
+        finally:
+            self._deadline = self._max_nodes = None
+        return best_move
+
+    def _search_root(self, board, moves, depth):
+        self._root_depth = depth
+        key = self._tt_key(board, True, self.tiles)
+        entry = self.tt.get(key) if self._use_tt else None
+        if entry and entry[1] == depth and entry[2] == EXACT:
+            self.search_stats["tt_hits"] += 1
+            self.search_stats["value"] = entry[0]
+            self.search_stats["depth"] = depth
+            r, c, piece = entry[3]
+            return (r, c, self.tiles.index(piece))
+        if self.ordering:
+            moves = self._order_moves(board, moves, self.tiles, 0)
+        if entry:
+            moves = self._hint_first(moves, self.tiles, entry[3])
+
+        if self.workers > 1 and len(moves) > 1:
+            best_move, best_value = self._search_root_parallel(board, moves, depth)
+        else:
+            pool = self.unseen_tiles(board)
+            best_move = None
+            best_value = -math.inf
+            for r, c, tile_index in moves:
+                value = self._play(board, r, c, tile_index, self.tiles, pool, depth, best_value, math.inf, True)
+                if value > best_value:
+                    best_value = value
+                    best_move = (r, c, tile_index)
+        if self._use_tt:
+            self.tt.store(key, best_value, depth, EXACT, (best_move[0], best_move[1], self.tiles[best_move[2]]))
+        self.search_stats["value"] = best_value
+        self.search_stats["depth"] = depth
         return best_move
 
-    def _minimax(self, board, depth, alpha, beta, maximizing):
+    def _search_root_parallel(self, board, moves, depth):
+        """
+        Root moves in batches of workers * ROOT_CHUNK, each worker searching a
+        contiguous chunk with the best value of the earlier batches as alpha.
+        A move only counts as better when strictly above everything before it
+        in move order, so the result is the sequential one for any worker count.
+        A cancelled turn stops the workers too, through the pool's stop event.
+        """
+        if self._executor is None:
+            self._stop = multiprocessing.Event()
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                 initargs=(self._stop,))
+        self._stop.clear()
+        chunk = self.ROOT_CHUNK
+        batch = self.workers * chunk
+        best_move = None
+        best_value = -math.inf
+        for start in range(0, len(moves), batch):
+            time_ms = max_nodes = None
+            if self._deadline is not None:
+                time_ms = max(0.0, (self._deadline - time.perf_counter()) * 1000)
+            if self._max_nodes is not None:
+                max_nodes = max(0, self._max_nodes - self.search_stats["nodes"])
+            futures = [self._executor.submit(_search_root_chunk, board, self.tiles, moves[k:k + chunk], depth,
+                                             best_value, time_ms, max_nodes, self.tt.max_entries, self.ordering)
+                       for k in range(start, min(start + batch, len(moves)), chunk)]
+            while wait(futures, timeout=0.05).not_done:
+                if self._cancel is not None and self._cancel.is_set():
+                    self._stop.set()
+                    wait(futures)
+                    raise SearchAborted()
+            results = [f.result() for f in futures]
+            for values, stats in results:
+                for key in ("nodes", "cutoffs", "tt_hits"):
+                    self.search_stats[key] += stats[key]
+            if any(values is None for values, _ in results):
+                raise SearchAborted()
+            values = [v for chunk_values, _ in results for v in chunk_values]
+            for move, value in zip(moves[start:start + batch], values):
+                if value > best_value:
+                    best_value = value
+                    best_move = move
+        return best_move, best_value
+
+    def _minimax(self, board, depth, alpha, beta, maximizing, rack, pool):
+        """
+        Alpha-beta value of the position for us: our points minus the opponent's
+        over the next `depth` plies. One ply is one tile followed by the end of
+        that player's turn. We play from `rack`; the opponent plays any tile
+        still in `pool` (the tiles we can't see).
+        """
+        self.search_stats["nodes"] += 1
+        if self._deadline is not None or self._max_nodes is not None or self._cancel is not None:
+            self._check_budget()
         if depth == 0:
-            score = board.score_current_turn()
-            for r in range(board.grid.rows):
-                for c in range(board.grid.cols):
-                    powerup = board.get_powerup_at(r, c)
-                    if powerup == PowerUp.WILD:
-                        score += 50
-                    elif powerup == PowerUp.DOUBLE:
-                        score += 25
-            return score
+            return 0
+
+        # values are sums over exactly `depth` plies, so only same-depth
+        # entries can bound this node; any stored best move is tried first
+        key = self._tt_key(board, maximizing, rack)
+        entry = self.tt.get(key) if self._use_tt else None
+        if entry and entry[1] == depth:
+            value, _, bound, _ = entry
+            if bound == EXACT:
+                self.search_stats["tt_hits"] += 1
+                return value
+            if bound == LOWER:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if alpha >= beta:
+                self.search_stats["tt_hits"] += 1
+                return value
+        alpha_orig, beta_orig = alpha, beta
 
+        tiles = rack if maximizing else [p for p, n in pool.items() if n]
+        moves = board.get_rack_moves(tiles, self.OPENING_RADIUS)
         if maximizing:
-            max_eval = -math.inf
-            score = board.score_current_turn()
-            max_eval = max(max_eval, score)
-            alpha = max(alpha, max_eval)
-            if beta <= alpha:
-                return max_eval
-            return max_eval
+            moves = [m for m in moves if self._is_adjacent_valid(m[0], m[1], board)]
+        if not moves:
+            # nothing to play: the turn passes to the other side
+            turn = board.apply_end_turn()
+            try:
+                return self._minimax(board, depth - 1, alpha, beta, not maximizing, rack, pool)
+            finally:
+                board.undo(turn)
+        ply = self._root_depth - depth
+        if self.ordering:
+            moves = self._order_moves(board, moves, tiles, ply)
+        if entry:
+            moves = self._hint_first(moves, tiles, entry[3])
+
+        best = -math.inf if maximizing else math.inf
+        best_move = None
+        for r, c, i in moves:
+            value = self._play(board, r, c, i, tiles, pool, depth, alpha, beta, maximizing, rack)
+            if maximizing:
+                if value > best:
+                    best, best_move = value, (r, c, tiles[i])
+                alpha = max(alpha, best)
+            else:
+                if value < best:
+                    best, best_move = value, (r, c, tiles[i])
+                beta = min(beta, best)
+            if alpha >= beta:
+                self.search_stats["cutoffs"] += 1
+                if self.ordering:
+                    self._record_cutoff(ply, depth, (r, c, tiles[i]))
+                break
+
+        if best <= alpha_orig:
+            bound = UPPER
+        elif best >= beta_orig:
+            bound = LOWER
         else:
-            min_eval = board.score_current_turn()
-            beta = min(beta, min_eval)
-            if beta <= alpha:
-                return min_eval
-            return min_eval
+            bound = EXACT
+        if self._use_tt:
+            self.tt.store(key, best, depth, bound, best_move)
+        return best
+
+    def _play(self, board, r, c, i, tiles, pool, depth, alpha, beta, maximizing, rack=None):
+        # value of playing tiles[i] on (r, c), then searching the other side's reply
+        piece = tiles[i]
+        token = board.apply((r, c, piece))
+        gain = token.earned + self.POWERUP_BONUS.get(token.powerup, 0)
+        turn = board.apply_end_turn()
+        try:
+            if maximizing:
+                rest = tiles[:i] + tiles[i+1:]
+                value = gain + self._minimax(board, depth - 1, alpha - gain, beta - gain, False, rest, pool)
+            else:
+                pool[piece] -= 1
+                try:
+                    value = -gain + self._minimax(board, depth - 1, alpha + gain, beta + gain, True, rack, pool)
+                finally:
+                    pool[piece] += 1
+        finally:
+            # also runs when SearchAborted unwinds the search
+            board.undo(turn)
+            board.undo(token)
+        return value
+
+    def _check_budget(self):
+        if self._cancel is not None and self._cancel.is_set():
+            raise SearchAborted()
+        nodes = self.search_stats["nodes"]
+        if self._max_nodes is not None and nodes > self._max_nodes:
+            raise SearchAborted()
+        if self._deadline is not None and time.perf_counter() > self._deadline:
+            raise SearchAborted()
+
+    def _order_moves(self, board, moves, tiles, ply):
+        # killers first, then immediate points plus power-up bonus, then cutoff history
+        killers = self._killers.get(ply, ())
+        history = self._history
+        cell_value = {}
+
+        def rank(move):
+            r, c, i = move
+            value = cell_value.get((r, c))
+            if value is None:
+                value = cell_value[(r, c)] = (board.placement_score(r, c) +
+                                              self.POWERUP_BONUS.get(board.get_powerup_at(r, c), 0))
+            piece = tiles[i]
+            return ((r, c, piece) in killers, value, history.get((r, c, piece.id), 0))
+        return sorted(moves, key=rank, reverse=True)
+
+    def _record_cutoff(self, ply, depth, move):
+        killers = self._killers.setdefault(ply, [])
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+        r, c, piece = move
+        key = (r, c, piece.id)
+        self._history[key] = self._history.get(key, 0) + depth * depth
+
+    def _age_history(self):
+        # a new search: earlier cutoffs count for less and the old killers are dropped
+        self._killers.clear()
+        for key in list(self._history):
+            self._history[key] //= 2
+            if not self._history[key]:
+                del self._history[key]
+
+    def _tt_key(self, board, maximizing, rack):
+        # the board hash covers tiles, power-ups and turn state; the opponent's
+        # pool follows from the board and our rack
+        return (board.zobrist_hash, maximizing, tuple(sorted(p.id for p in rack)))
+
+    def _uses_tt(self, board):
+        # an UNDO power-up takes off tiles picked by board.history, which the key
+        # leaves out, and they don't go back to the pool; so a search that can
+        # fire one neither reads nor writes the table. Searches add no power-ups,
+        # so every entry comes from a subtree without UNDO.
+        return PowerUp.UNDO not in board.powerup_cells.values()
+
+    def _hint_first(self, moves, tiles, hint):
+        for k, (r, c, i) in enumerate(moves):
+            if (r, c, tiles[i]) == hint:
+                return [moves[k]] + moves[:k] + moves[k+1:]
+        return moves
+
+    def unseen_tiles(self, board):
+        """Tiles we can't see (opponent's rack plus the bag), as a Counter of pieces."""
+        pool = Counter({piece: TILE_COPIES for piece in ALL_PIECES})
+        for r, c in board.grid.get_occupied_cells():
+            pool[board.grid.get(r, c)] -= 1
+        for piece in self.tiles:
+            pool[piece] -= 1
+        return Counter({piece: n for piece, n in pool.items() if n > 0})
 
     def _is_adjacent_valid(self, r, c, board):
+        if not board.frontier:
+            # empty board: the opening tile may go anywhere
+            return True
         neighbors = board.grid.get_neighbors(r, c)
         for nr, nc in neighbors:
             if board.grid.get(nr, nc) is not None:
                 return True
-        return False
\ No newline at end of file
+        return False
+
+# one search instance per pool worker, so its transposition table lasts across moves
+_worker_ai = None
+# the owning QwirkleAI's stop event, set when its turn is cancelled
+_worker_stop = None
+
+
+def _init_worker(stop):
+    global _worker_stop
+    _worker_stop = stop
+
+
+def _search_root_chunk(board, tiles, moves, depth, alpha, time_ms, max_nodes, tt_size, ordering):
+    # runs in a pool worker: values of root moves in order, or None if the budget ran out
+    global _worker_ai
+    if _worker_ai is None or _worker_ai.tt.max_entries != tt_size:
+        _worker_ai = QwirkleAI(tt_size=tt_size, book=None)
+    ai = _worker_ai
+    ai.ordering = ordering
+    ai.tiles = tiles
+    ai.search_stats = {"nodes": 0, "cutoffs": 0, "tt_hits": 0, "value": None, "depth": 0}
+    ai._deadline = time.perf_counter() + time_ms / 1000 if time_ms is not None else None
+    ai._max_nodes = max_nodes
+    ai._cancel = _worker_stop
+    ai._root_depth = depth
+    ai._use_tt = ai._uses_tt(board)
+    pool = ai.unseen_tiles(board)
+    values = []
+    try:
+        for r, c, i in moves:
+            value = ai._play(board, r, c, i, tiles, pool, depth, alpha, math.inf, True)
+            values.append(value)
+            alpha = max(alpha, value)
+    except SearchAborted:
+        values = None
+    finally:
+        ai._deadline = ai._max_nodes = None
+    return values, ai.search_stats
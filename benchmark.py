@@ -0,0 +1,313 @@
+"""
+Microbenchmarks for the Board and QwirkleAI hot paths on fixed, seeded
+positions at several board sizes and fill levels.
+
+    python benchmark.py --out before.json
+    python benchmark.py --compare before.json --threshold 0.10
+
+Each result is the best of --repeat runs, as microseconds per call. --compare
+prints the ratio to an earlier run for every benchmark both runs have, flags
+the ones more than --threshold slower and exits with status 1 if any are.
+The AI benchmarks also record what the search did (its move and node count),
+so a change in behavior shows up next to a change in speed.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+from board import Board
+from ai import QwirkleAI
+from hexgrid import GRIDS, SparseHexGrid
+from piece import ALL_PIECES
+
+SIZES = (6, 10)
+FILLS = (0.1, 0.3, 0.6)
+RACK_SIZE = 6
+# shortest timed sample; quick calls are repeated until a sample is this long
+MIN_SAMPLE_S = 0.02
+# choose_move settings: fixed depth and iterations, so the work done doesn't depend on the machine.
+# The key is the difficulty unless the settings name one; hard_noorder is hard without move
+# ordering, so its node count shows what ordering saves on the same positions.
+AI_SETTINGS = {
+    "easy": {},
+    "medium": {},
+    "hard": {"max_depth": 2},
+    "hard_noorder": {"difficulty": "hard", "max_depth": 2, "ordering": False},
+    "mcts": {"iterations": 200},
+}
+
+
+def make_position(size, fill, seed, tiles=None, grid_cls=SparseHexGrid):
+    """
+    (board, rack): size x size board with fill of its cells taken by random
+    one-tile turns (power-up cells left free) and a random rack, all from seed.
+    With tiles, that many tiles are placed on a small board instead and
+    copied to the middle of this one, so every size gets the same position.
+    grid_cls is the Board's grid backend; the position doesn't depend on it.
+    """
+    core = size if tiles is None else min(size, max(6, math.isqrt(4 * tiles)))
+    rng = random.Random(seed)
+    random.seed(seed)
+    board = Board(core, core, 0, 0, 0, 0, 0, grid_cls=grid_cls)
+    placed = []
+    for _ in range(int(size * size * fill) if tiles is None else tiles):
+        if not board.frontier:
+            # empty board: any kind on any free cell, drawn without listing every move
+            cells = [cell for cell in board.grid.get_empty_cells() if not board.get_powerup_at(*cell)]
+            k = rng.randrange(len(cells) * len(ALL_PIECES))
+            (r, c), i = cells[k // len(ALL_PIECES)], k % len(ALL_PIECES)
+        else:
+            moves = [m for m in board.get_rack_moves(ALL_PIECES) if not board.get_powerup_at(m[0], m[1])]
+            if not moves:
+                break
+            r, c, i = rng.choice(moves)
+        board.apply((r, c, ALL_PIECES[i]))
+        board.end_turn()
+        placed.append((r, c, ALL_PIECES[i]))
+    rack = [rng.choice(ALL_PIECES) for _ in range(RACK_SIZE)]
+
+    if core < size:
+        # an even column shift keeps the odd-q hex layout
+        dr = (size - core) // 2
+        dc = dr - dr % 2
+        big = Board(size, size, 0, 0, 0, 0, 0, grid_cls=grid_cls)
+        for cell in list(big.powerup_cells):
+            big.clear_powerup(*cell)
+        for (r, c), pu in board.powerup_cells.items():
+            big.set_powerup(r + dr, c + dc, pu)
+        for r, c, piece in placed:
+            big.apply((r + dr, c + dc, piece))
+            big.end_turn()
+        board = big
+    board.start_turn()
+    return board, rack
+
+
+def _best(repeat, run):
+    # run() returns (seconds, calls); calls it until a sample lasts MIN_SAMPLE_S,
+    # returns the best per-call time over repeat samples, in us
+    best = math.inf
+    for _ in range(repeat):
+        seconds = calls = 0
+        while seconds < MIN_SAMPLE_S:
+            s, n = run()
+            if not n:
+                break
+            seconds += s
+            calls += n
+        if calls:
+            best = min(best, seconds / calls)
+    return best * 1e6 if best < math.inf else None
+
+
+def bench_place_piece(board, rack, repeat):
+    moves = [(r, c, rack[i]) for r, c, i in board.get_rack_moves(rack)]
+
+    def run():
+        boards = [board.clone() for _ in moves]
+        start = time.perf_counter()
+        for b, (r, c, piece) in zip(boards, moves):
+            b.place_piece(r, c, piece)
+        return time.perf_counter() - start, len(moves)
+    return _best(repeat, run), {"calls": len(moves)}
+
+
+def bench_get_valid_moves(board, rack, repeat):
+    def run():
+        start = time.perf_counter()
+        for piece in rack:
+            board.get_valid_moves(piece)
+        return time.perf_counter() - start, len(rack)
+    return _best(repeat, run), {"moves": sum(len(board.get_valid_moves(p)) for p in rack)}
+
+
+def bench_validate_line(board, rack, repeat):
+    cells = board.candidate_cells()
+
+    def run():
+        start = time.perf_counter()
+        for r, c in cells:
+            for piece in rack:
+                board._validate_line(r, c, piece)
+        return time.perf_counter() - start, len(cells) * len(rack)
+    return _best(repeat, run), {"calls": len(cells) * len(rack)}
+
+
+def bench_score_current_turn(board, rack, repeat):
+    # one tile pending, as during a turn
+    moves = board.get_rack_moves(rack)
+    if not moves:
+        return None, {}
+    board = board.clone()
+    r, c, i = moves[0]
+    board.place_piece(r, c, rack[i])
+    calls = 1000
+
+    def run():
+        start = time.perf_counter()
+        for _ in range(calls):
+            board.score_current_turn()
+        return time.perf_counter() - start, calls
+    return _best(repeat, run), {"score": board.score_current_turn()}
+
+
+def bench_start_turn(board, rack, repeat):
+    board = board.clone()
+    calls = 200
+
+    def run():
+        start = time.perf_counter()
+        for _ in range(calls):
+            board.start_turn()
+        return time.perf_counter() - start, calls
+    return _best(repeat, run), {}
+
+
+def bench_reset_turn(board, rack, repeat):
+    # undo a one-tile turn
+    moves = board.get_rack_moves(rack)
+    if not moves:
+        return None, {}
+    r, c, i = moves[0]
+
+    def run():
+        boards = [board.clone() for _ in range(100)]
+        for b in boards:
+            b.place_piece(r, c, rack[i])
+        start = time.perf_counter()
+        for b in boards:
+            b.reset_turn()
+        return time.perf_counter() - start, len(boards)
+    return _best(repeat, run), {}
+
+
+def bench_choose_move(name):
+    settings = {"difficulty": name, **AI_SETTINGS[name]}
+
+    def bench(board, rack, repeat):
+        info = {}
+
+        def run():
+            ai = QwirkleAI(seed=0, book=None, **settings)
+            ai.set_tiles(list(rack))
+            start = time.perf_counter()
+            move = ai.choose_move(board)
+            elapsed = time.perf_counter() - start
+            info["move"] = move
+            if ai.difficulty == "hard":
+                info["nodes"] = ai.search_stats["nodes"]
+            return elapsed, 1
+        return _best(repeat, run), info
+    return bench
+
+
+BENCHMARKS = {
+    "place_piece": bench_place_piece,
+    "get_valid_moves": bench_get_valid_moves,
+    "_validate_line": bench_validate_line,
+    "score_current_turn": bench_score_current_turn,
+    "start_turn": bench_start_turn,
+    "reset_turn": bench_reset_turn,
+}
+BENCHMARKS.update({f"choose_move_{name}": bench_choose_move(name) for name in AI_SETTINGS})
+
+
+def run_suite(sizes, fills, repeat, seed, only=None, tiles=None, grids=("sparse",)):
+    # with tiles, every size gets the same tile count instead of a fill level;
+    # every grid backend in grids gets the same positions
+    results = {}
+    for size in sizes:
+        for fill in fills if tiles is None else [None]:
+            for grid in grids:
+                if tiles is None:
+                    board, rack = make_position(size, fill, seed + size * 100 + int(fill * 100), grid_cls=GRIDS[grid])
+                    label = f"fill{int(fill * 100)}"
+                else:
+                    board, rack = make_position(size, 0, seed + tiles, tiles, grid_cls=GRIDS[grid])
+                    label = f"tiles{tiles}"
+                for name, bench in BENCHMARKS.items():
+                    if only and only not in name:
+                        continue
+                    key = f"{name}/{grid}/{size}x{size}/{label}"
+                    us, info = bench(board, rack, repeat)
+                    results[key] = {"us_per_call": us, **info}
+                    line = f"{key:<48} {us:>12.2f} us" if us is not None else f"{key:<48} {'n/a':>12}"
+                    if "nodes" in info:
+                        line += f"  {info['nodes']:>8} nodes"
+                    print(line, flush=True)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Prints new/old time ratios; returns the keys more than threshold slower."""
+    slower = []
+    for key, res in results.items():
+        old = baseline.get(key)
+        if not old or res["us_per_call"] is None or not old["us_per_call"]:
+            continue
+        ratio = res["us_per_call"] / old["us_per_call"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            slower.append(key)
+        elif ratio < 1 - threshold:
+            flag = "  faster"
+        print(f"{key:<48} {old['us_per_call']:>12.2f} -> {res['us_per_call']:>12.2f} us  x{ratio:.2f}{flag}")
+    return slower
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Board and QwirkleAI microbenchmarks.")
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)), help="comma separated board sizes")
+    parser.add_argument("--fills", default=",".join(map(str, FILLS)), help="comma separated fill fractions")
+    parser.add_argument("--tiles", type=int, help="place this many tiles on every size instead of --fills")
+    parser.add_argument("--grid", nargs="+", choices=sorted(GRIDS), default=["sparse"],
+                        help="grid backends to run, side by side on the same positions")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", help="run benchmarks whose name contains this")
+    parser.add_argument("--out", help="write the results as JSON here")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="slowdown flagged as a regression")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    fills = [float(f) for f in args.fills.split(",")]
+    results = run_suite(sizes, fills, args.repeat, args.seed, args.only, args.tiles, args.grid)
+    report = {
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "grids": args.grid,
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        slower = compare(results, baseline, args.threshold)
+        print(f"{len(slower)} regression(s) over {args.threshold:.0%}")
+        if slower:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,10 @@
-import copy
 import random
-import pygame
-from piece import Piece
 #from hexlib import HexGrid  # Import the hexlib library
-from hexgrid import HexGrid
+from hexgrid import HexGrid, CompactHexGrid, SparseHexGrid
+from segments import SegmentIndex, is_cohesive, matching_kinds, ALL_KINDS
+import zobrist
 
 
-
-
-# Initialize Pygame
-pygame.init()
-
-# Initialize the mixer module for sound
-pygame.mixer.init()
-
-powerup_sound = pygame.mixer.Sound("powerup_sound.mp3")  # Replace with your actual sound file
-
 class InvalidMoveException(Exception):
     pass
 
@@ -24,63 +13,207 @@ class PowerUp:
     DOUBLE = 'double_score'
     WILD = 'wildcard'
 
+_POWERUP_SLOTS = {PowerUp.UNDO: 0, PowerUp.DOUBLE: 1, PowerUp.WILD: 2}
+
+class MoveToken:
+    """Everything Board.undo() needs to revert one Board.apply()."""
+    __slots__ = ('row', 'col', 'powerup', 'double_score_enabled', 'bypass_rules',
+                 'turn_score', 'earned', 'turn_moves', 'kept_moves', 'grid', 'history_entry')
+
+    def __init__(self, row, col, powerup, double_score_enabled, bypass_rules, turn_score):
+        self.row = row
+        self.col = col
+        self.powerup = powerup
+        self.double_score_enabled = double_score_enabled
+        self.bypass_rules = bypass_rules
+        self.turn_score = turn_score
+        self.earned = 0
+        self.turn_moves = None
+        self.kept_moves = None
+        self.grid = None
+        self.history_entry = None
+
+class TurnToken:
+    """What Board.undo() needs to revert one Board.apply_end_turn()."""
+    __slots__ = ('turn_moves', 'kept_moves', 'double_score_enabled', 'bypass_rules', 'turn_score', 'turn_hash')
+
+    def __init__(self, turn_moves, kept_moves, double_score_enabled, bypass_rules, turn_score, turn_hash):
+        self.turn_moves = turn_moves
+        self.kept_moves = kept_moves
+        self.double_score_enabled = double_score_enabled
+        self.bypass_rules = bypass_rules
+        self.turn_score = turn_score
+        self.turn_hash = turn_hash
+
 class Board:
-    AXES = [
-        (( 0, -1), ( 0,  1)),
-        ((-1,  1), ( 1, -1)),
-        ((-1,  0), ( 1,  0)),
-    ]
+    AXES = HexGrid.AXES
+
+    # methods instrumentation.py counts and times while it is enabled
+    INSTRUMENTED = ('place_piece', 'apply', 'apply_end_turn', 'undo', 'get_valid_moves', 'get_rack_moves',
+                    'allowed_kinds', '_validate_line', '_score_delta', 'score_current_turn', 'placement_score',
+                    'clone', 'start_turn', 'reset_turn', 'end_turn', '_rebuild_indexes')
 
-    def __init__(self, rows, cols, hex_spacing_x, hex_height, hex_radius, grid_x, grid_y):
+    def __init__(self, rows, cols, hex_spacing_x, hex_height, hex_radius, grid_x, grid_y, grid_cls=SparseHexGrid):
         self.rows = rows
         self.cols = cols
-        self.grid = HexGrid(rows, cols, hex_spacing_x, hex_height, hex_radius, grid_x, grid_y)
-        self.powerups = [[None for _ in range(cols)] for _ in range(rows)]
+        # grid_cls picks the storage backend: SparseHexGrid (dict of tiles), HexGrid (list of lists)
+        # or CompactHexGrid (bytearray)
+        self.grid = grid_cls(rows, cols, hex_spacing_x, hex_height, hex_radius, grid_x, grid_y)
+        self.segments = SegmentIndex(rows, cols, len(self.AXES))
+        # frontier: empty cells touching at least one tile; _contacts counts those tiles per cell index
+        self.frontier = set()
+        self._contacts = {}
+        self.tile_count = 0
+        self.powerup_cells = {}
+        # Zobrist hash parts, kept up to date by every place/undo/powerup change
+        self._cells_hash = 0
+        self._powerups_hash = 0
+        self._turn_hash = 0
+        # raw (undoubled) score of current_turn_moves, updated per placement
+        self._turn_score = 0
         self.current_turn_moves = []
-        self.previous_state = copy.deepcopy(self.grid)
-        self.history = [copy.deepcopy(self.grid)]
+        self.previous_state = self.grid.clone()
+        # tiles each finished turn placed, as tuples of (row, col, piece); the UNDO
+        # power-up takes off the last turn's with them. The first entry stands for the start.
+        self.history = [()]
+        # tiles a start_turn() kept without an end_turn(); they go into the next history entry
+        self._kept_moves = []
         self.double_score_enabled = False
         self.bypass_rules = False
+        # event name -> callbacks; see add_hook
+        self._hooks = {}
         self._spawn_powerups()
 
+    def add_hook(self, event, fn):
+        """
+        Calls fn(**details) when event happens through place_piece:
+        "place" (row, col, piece, points) for every tile and "powerup"
+        (row, col, powerup) when the tile lands on a power-up. apply() and the
+        searches never fire hooks, and clones start without any, so sounds
+        and other GUI side effects stay with the board the GUI registered on.
+        """
+        self._hooks.setdefault(event, []).append(fn)
+
+    def remove_hook(self, event, fn):
+        self._hooks.get(event, []).remove(fn)
+
+    def _emit(self, event, **details):
+        for fn in self._hooks.get(event, ()):
+            fn(**details)
+
+    def __getstate__(self):
+        # hooks belong to this process's GUI, and are often not picklable
+        state = self.__dict__.copy()
+        state['_hooks'] = {}
+        return state
+
     def _spawn_powerups(self):
+        # the same draws as random.choice over the list of empty cells (the board
+        # is empty here), without building that list
         types = [PowerUp.UNDO, PowerUp.DOUBLE, PowerUp.WILD]
-        free_cells = self.grid.get_empty_cells()
+        taken = []
         for pu in types:
-            r, c = random.choice(free_cells)
-            free_cells.remove((r, c))
-            self.powerups[r][c] = pu
+            k = random.randrange(self.rows * self.cols - len(taken))
+            for t in sorted(taken):
+                if t <= k:
+                    k += 1
+            taken.append(k)
+            r, c = divmod(k, self.cols)
+            self.set_powerup(r, c, pu)
 
     def get_powerup_at(self, row, col):
-        return self.powerups[row][col]
+        return self.powerup_cells.get((row, col))
+
+    def set_powerup(self, row, col, pu):
+        old = self.powerup_cells.get((row, col))
+        if old:
+            self._powerups_hash ^= zobrist.powerup_key(row*self.cols + col, _POWERUP_SLOTS[old])
+        if pu:
+            self._powerups_hash ^= zobrist.powerup_key(row*self.cols + col, _POWERUP_SLOTS[pu])
+        if pu:
+            self.powerup_cells[(row, col)] = pu
+        else:
+            self.powerup_cells.pop((row, col), None)
 
     def clear_powerup(self, row, col):
-        self.powerups[row][col] = None
+        self.set_powerup(row, col, None)
+
+    @property
+    def zobrist_hash(self):
+        """
+        64-bit hash of tiles, remaining power-ups, pending turn moves and the
+        turn flags. Identical positions hash the same in any process; history
+        is not part of it.
+        """
+        h = self._cells_hash ^ self._powerups_hash ^ self._turn_hash
+        if self.double_score_enabled:
+            h ^= zobrist.DOUBLE_SCORE_KEY
+        if self.bypass_rules:
+            h ^= zobrist.BYPASS_RULES_KEY
+        return h
 
-    def start_turn(self):
-        self.previous_state = copy.deepcopy(self.grid)
+    def _clear_turn_moves(self):
+        self.segments.clear_pending([(r, c) for r, c, _ in self.current_turn_moves])
         self.current_turn_moves.clear()
+        self._turn_hash = 0
+        self._turn_score = 0
+
+    def start_turn(self):
+        self.previous_state = self.grid.clone()
+        self._kept_moves.extend(self.current_turn_moves)
+        self._clear_turn_moves()
         self.double_score_enabled = False
         self.bypass_rules = False
 
     def reset_turn(self):
-        self.grid = copy.deepcopy(self.previous_state)
-        self.current_turn_moves.clear()
+        self._clear_turn_moves()
+        self.grid = self.previous_state.clone()
+        self._rebuild_indexes()
         self.double_score_enabled = False
         self.bypass_rules = False
 
+    def clone(self):
+        """
+        Independent copy of the position and turn state, for searching without
+        touching this board. history entries are tuples, so the copy shares
+        them.
+        """
+        new = object.__new__(Board)
+        new.__dict__.update(self.__dict__)
+        new.grid = self.grid.clone()
+        new.segments = SegmentIndex(self.rows, self.cols, len(self.AXES))
+        new.powerup_cells = dict(self.powerup_cells)
+        new.current_turn_moves = list(self.current_turn_moves)
+        new.history = list(self.history)
+        new._kept_moves = list(self._kept_moves)
+        new._hooks = {}
+        new._rebuild_indexes()
+        return new
+
     def place_piece(self, row, col, piece):
+        token = self.apply((row, col, piece))
+        if token.powerup:
+            self._emit("powerup", row=row, col=col, powerup=token.powerup)
+        self._emit("place", row=row, col=col, piece=piece, points=token.earned)
+        return token.earned
+
+    def apply(self, move):
+        """
+        Place move = (row, col, piece) in place, without any sound, and return
+        a MoveToken that undo() uses to restore the exact previous state.
+        """
+        row, col, piece = move
         if not self.grid.is_valid_position(row, col):
             raise InvalidMoveException("Move out of board boundaries.")
         if self.grid.is_occupied(row, col):
             raise InvalidMoveException("Space is already occupied.")
 
         pu = self.get_powerup_at(row, col)
+        token = MoveToken(row, col, pu, self.double_score_enabled, self.bypass_rules, self._turn_score)
 
         if pu == PowerUp.WILD:
             self.bypass_rules = True
             self.clear_powerup(row, col)
-            powerup_sound.play()
         else:
             if not self._is_adjacent_valid(row, col, piece):
                 raise InvalidMoveException("Move must be adjacent to existing tiles.")
@@ -88,20 +221,30 @@ class Board:
                 raise InvalidMoveException("Piece placement breaks cohesion rules.")
 
         before_score = self.score_current_turn()
+        self._turn_score += self._score_delta(row, col)
         self.grid.place_tile(row, col, piece)
+        self._tile_added(row, col, piece)
         self.current_turn_moves.append((row, col, piece))
+        self._turn_hash ^= zobrist.pending_key(row*self.cols + col)
 
         if pu == PowerUp.UNDO:
             self.clear_powerup(row, col)
+            token.turn_moves = list(self.current_turn_moves)
+            token.grid = self.grid
+            self._clear_turn_moves()
             if len(self.history) >= 2:
-                self.history.pop()
-                self.grid = copy.deepcopy(self.history[-1])
+                # back to the grid as the turn before last left it
+                token.history_entry = self.history.pop()
+                token.kept_moves = self._kept_moves
+                self._kept_moves = []
+                self.grid = self.grid.clone()
+                for r, c, _ in token.turn_moves + token.kept_moves + list(token.history_entry):
+                    self.grid.place_tile(r, c, None)
+                self._rebuild_indexes()
 
-            self.current_turn_moves.clear()
             self.double_score_enabled = False
             self.bypass_rules = False
-            powerup_sound.play()
-            return 0
+            return token
 
         after_score = self.score_current_turn()
         earned = after_score - before_score
@@ -109,56 +252,184 @@ class Board:
             earned *= 2
             self.clear_powerup(row, col)
             self.double_score_enabled = False
-            powerup_sound.play()
 
-        return earned
+        token.earned = earned
+        return token
+
+    def apply_end_turn(self):
+        """end_turn() that undo() can revert; search uses it to hand over to the other player."""
+        token = TurnToken(list(self.current_turn_moves), self._kept_moves, self.double_score_enabled,
+                          self.bypass_rules, self._turn_score, self._turn_hash)
+        self.end_turn()
+        return token
+
+    def undo(self, token):
+        if token.__class__ is TurnToken:
+            self.history.pop()
+            self._kept_moves = token.kept_moves
+            self.current_turn_moves[:] = token.turn_moves
+            self.segments.mark_pending([(r, c) for r, c, _ in token.turn_moves])
+            self._turn_score = token.turn_score
+            self._turn_hash = token.turn_hash
+            self.double_score_enabled = token.double_score_enabled
+            self.bypass_rules = token.bypass_rules
+            return
+        row, col = token.row, token.col
+        if token.turn_moves is not None:
+            # UNDO power-up fired: put back the grid and history it replaced
+            if token.history_entry is not None:
+                self.history.append(token.history_entry)
+                self._kept_moves = token.kept_moves
+            self.grid = token.grid
+            self.current_turn_moves[:] = token.turn_moves
+            self.current_turn_moves.pop()
+            self._turn_hash = 0
+            for r, c, _ in self.current_turn_moves:
+                self._turn_hash ^= zobrist.pending_key(r*self.cols + c)
+            self.grid.place_tile(row, col, None)
+            self._rebuild_indexes()
+        else:
+            piece = self.current_turn_moves.pop()[2]
+            self._turn_hash ^= zobrist.pending_key(row*self.cols + col)
+            self.grid.place_tile(row, col, None)
+            self._tile_removed(row, col, piece)
+        self._turn_score = token.turn_score
+        self.set_powerup(row, col, token.powerup)
+        self.double_score_enabled = token.double_score_enabled
+        self.bypass_rules = token.bypass_rules
+
+    def _tile_added(self, row, col, piece):
+        self._cells_hash ^= zobrist.piece_key(row*self.cols + col, piece)
+        self.segments.add(self.grid, row, col, piece)
+        self.frontier.discard((row, col))
+        self.tile_count += 1
+        cols = self.cols
+        contacts = self._contacts
+        for r, c in self.grid.get_adjacent(row, col):
+            contacts[r*cols + c] = contacts.get(r*cols + c, 0) + 1
+            if not self.grid.is_occupied(r, c):
+                self.frontier.add((r, c))
+
+    def _tile_removed(self, row, col, piece):
+        self._cells_hash ^= zobrist.piece_key(row*self.cols + col, piece)
+        self.segments.remove(self.grid, row, col, {(r, c) for r, c, _ in self.current_turn_moves})
+        self.tile_count -= 1
+        cols = self.cols
+        contacts = self._contacts
+        for r, c in self.grid.get_adjacent(row, col):
+            i = r*cols + c
+            contacts[i] -= 1
+            if not contacts[i]:
+                del contacts[i]
+                self.frontier.discard((r, c))
+        if row*cols + col in contacts:
+            self.frontier.add((row, col))
+
+    def _rebuild_indexes(self):
+        # after the whole grid was swapped out (reset_turn, UNDO power-up)
+        self.segments.rebuild(self.grid, {(r, c) for r, c, _ in self.current_turn_moves})
+        self.frontier = set()
+        self._contacts = contacts = {}
+        self._cells_hash = 0
+        self.tile_count = 0
+        cols = self.cols
+        for row, col in self.grid.get_occupied_cells():
+            self._cells_hash ^= zobrist.piece_key(row*cols + col, self.grid.get(row, col))
+            self.tile_count += 1
+            for r, c in self.grid.get_adjacent(row, col):
+                contacts[r*cols + c] = contacts.get(r*cols + c, 0) + 1
+                if not self.grid.is_occupied(r, c):
+                    self.frontier.add((r, c))
+
+    def candidate_cells(self, opening_radius=None):
+        """
+        Empty cells that could take a tile, in row-major order: the frontier
+        (only its part next to this turn's tiles mid-turn), or every cell on an
+        empty board. With opening_radius, an empty board only offers the cells
+        within that many rows and columns of the centre.
+        """
+        if not self.tile_count and not self.current_turn_moves:
+            if opening_radius is None:
+                return self.grid.get_empty_cells()
+            r0, c0 = self.rows // 2, self.cols // 2
+            return [(r, c) for r in range(max(0, r0 - opening_radius), min(self.rows, r0 + opening_radius + 1))
+                    for c in range(max(0, c0 - opening_radius), min(self.cols, c0 + opening_radius + 1))]
+        if self.current_turn_moves:
+            # later tiles of a turn must touch one of its earlier tiles
+            frontier = self.frontier
+            return sorted({cell for r, c, _ in self.current_turn_moves
+                           for cell in self.grid.get_neighbors(r, c) if cell in frontier})
+        return sorted(self.frontier)
+
+    def allowed_kinds(self, row, col):
+        """
+        Bitmask over Piece.id of the kinds the rules (adjacency + line cohesion)
+        allow on empty (row, col); same answers as _is_adjacent_valid and
+        _validate_line.
+        """
+        if not self.current_turn_moves:
+            if not self.tile_count:
+                kinds = ALL_KINDS
+            else:
+                kinds = 0
+                for step in self.grid.get_steps(row, col):
+                    if step:
+                        neighbor = self.grid.get(*step)
+                        if neighbor:
+                            kinds |= matching_kinds(neighbor)
+        else:
+            kinds = 0
+            for pr, pc, placed in self.current_turn_moves:
+                if (row, col) in self.grid.get_neighbors(pr, pc):
+                    kinds |= matching_kinds(placed)
+        if kinds and not self.bypass_rules:
+            for axis in range(len(self.AXES)):
+                kinds &= self.segments.allowed_kinds(self.grid, row, col, axis)
+        return kinds
+
+    def get_rack_moves(self, rack, opening_radius=None):
+        """
+        Every (row, col, rack_index) that place_piece would accept, in row-major
+        cell order: each candidate cell's allowed kinds are computed once and
+        intersected with the rack. Empty WILD cells take any tile.
+        opening_radius is passed to candidate_cells.
+        """
+        moves = []
+        cells = self.candidate_cells(opening_radius)
+        wild = [cell for cell, pu in self.powerup_cells.items() if pu == PowerUp.WILD]
+        if wild:
+            cells = sorted(set(cells).union(cell for cell in wild if not self.grid.is_occupied(*cell)))
+        for r, c in cells:
+            if self.powerup_cells.get((r, c)) == PowerUp.WILD:
+                kinds = ALL_KINDS
+            else:
+                kinds = self.allowed_kinds(r, c)
+            if kinds:
+                for i, piece in enumerate(rack):
+                    if kinds >> piece.id & 1:
+                        moves.append((r, c, i))
+        return moves
 
     def get_valid_moves(self, piece):
         valid = []
-        snapshot_grid = copy.deepcopy(self.grid)
-        snapshot_moves = list(self.current_turn_moves)
-        snapshot_double = self.double_score_enabled
-        snapshot_bypass = self.bypass_rules
-        snapshot_powerups = copy.deepcopy(self.powerups)
-
-        for r in range(self.rows):
-            for c in range(self.cols):
-                if snapshot_grid.get(r, c) is None:
-                    self.grid = copy.deepcopy(snapshot_grid)
-                    self.current_turn_moves = list(snapshot_moves)
-                    self.double_score_enabled = snapshot_double
-                    self.bypass_rules = snapshot_bypass
-                    self.powerups = copy.deepcopy(snapshot_powerups)
-
-                    if self._is_adjacent_valid(r, c, piece) and self._validate_line(r, c, piece):
-                        valid.append((r, c))
-
-        self.grid = snapshot_grid
-        self.current_turn_moves = snapshot_moves
-        self.double_score_enabled = snapshot_double
-        self.bypass_rules = snapshot_bypass
-        self.powerups = snapshot_powerups
+        for r, c in self.candidate_cells():
+            if self._is_adjacent_valid(r, c, piece) and self._validate_line(r, c, piece):
+                valid.append((r, c))
         return valid
 
     def check_for_full_board(self):
-        for r in range(self.rows):
-            for c in range(self.cols):
-                if self.grid.get(r, c) is None:
-                    return False
-        return True
+        return self.tile_count == self.rows * self.cols
 
     def _is_adjacent_valid(self, row, col, new_piece):
-        if self.grid.is_empty() and not self.current_turn_moves:
+        if not self.tile_count and not self.current_turn_moves:
             return True
 
         if not self.current_turn_moves:
-            for (dr1, dc1), (dr2, dc2) in self.AXES:
-                for dr, dc in ((dr1, dc1), (dr2, dc2)):
-                    nr, nc = row + dr, col + dc
-                    if self.grid.is_valid_position(nr, nc):
-                        neighbor = self.grid.get(nr, nc)
-                        if neighbor and (neighbor.color == new_piece.color or neighbor.shape == new_piece.shape):
-                            return True
+            for step in self.grid.get_steps(row, col):
+                if step:
+                    neighbor = self.grid.get(*step)
+                    if neighbor and (neighbor.color == new_piece.color or neighbor.shape == new_piece.shape):
+                        return True
             return False
 
         for pr, pc, placed in self.current_turn_moves:
@@ -168,65 +439,63 @@ class Board:
         return False
 
     def score_current_turn(self):
-        total = 0
-        counted = set()
-        for r, c, _ in self.current_turn_moves:
-            for axis_idx in range(len(self.AXES)):
-                length, positions = self._calculate_line_score(r, c, axis_idx)
-                newpos = positions - counted
-                total += len(newpos)
-                counted |= newpos
-                if length == 6:
-                    total += 6
         if self.double_score_enabled:
-            total *= 2
-        return total
+            return self._turn_score * 2
+        return self._turn_score
+
+    def placement_score(self, row, col):
+        """Points a tile on empty (row, col) would add to this turn, before any DOUBLE power-up on that cell."""
+        delta = self._score_delta(row, col)
+        return delta * 2 if self.double_score_enabled else delta
+
+    def _score_delta(self, row, col):
+        """
+        Change in the raw turn score from placing a turn tile on empty (row, col).
+        The turn score is the number of cells on lines through this turn's tiles
+        plus 6 per (turn tile, axis) on a line of exactly six, so only the runs
+        this tile joins can change it.
+        """
+        delta = 1
+        for axis in range(len(self.AXES)):
+            length = turn_tiles = 1
+            for seg in self.segments.neighbor_segments(self.grid, row, col, axis):
+                if not seg:
+                    continue
+                length += seg.length
+                turn_tiles += seg.turn_tiles
+                if seg.length == 6:
+                    delta -= 6 * seg.turn_tiles
+                if not seg.turn_tiles:
+                    # these cells start counting unless another axis already covers them
+                    for r, c in seg.cells:
+                        if not self._scored_elsewhere(r, c, axis):
+                            delta += 1
+            if length == 6:
+                delta += 6 * turn_tiles
+        return delta
+
+    def _scored_elsewhere(self, row, col, axis):
+        for other in range(len(self.AXES)):
+            if other != axis:
+                seg = self.segments.segment_at(other, row, col)
+                if seg and seg.turn_tiles:
+                    return True
+        return False
 
     def end_turn(self):
-        self.current_turn_moves.clear()
+        self.history.append(tuple(self._kept_moves + self.current_turn_moves))
+        self._kept_moves = []
+        self._clear_turn_moves()
         self.double_score_enabled = False
         self.bypass_rules = False
-        self.history.append(copy.deepcopy(self.grid))
 
     def _validate_line(self, row, col, piece):
         if self.bypass_rules:
             return True
 
-        for (dr1, dc1), (dr2, dc2) in self.AXES:
-            line = [piece]
-            r, c = row + dr1, col + dc1
-            while self.grid.is_valid_position(r, c) and self.grid.get(r, c):
-                line.insert(0, self.grid.get(r, c))
-                r += dr1; c += dc1
-            r, c = row + dr2, col + dc2
-            while self.grid.is_valid_position(r, c) and self.grid.get(r, c):
-                line.append(self.grid.get(r, c))
-                r += dr2; c += dc2
-
-            if not self._check_cohesion(line):
+        for axis in range(len(self.AXES)):
+            if not is_cohesive(*self.segments.line_through(self.grid, row, col, axis, piece)):
                 return False
 
         return True
 
-    def _check_cohesion(self, line):
-        if len(line) <= 1:
-            return True
-        colors = {p.color for p in line}
-        shapes = {p.shape for p in line}
-        return (len(colors) == 1 and len(shapes) == len(line)) or (len(shapes) == 1 and len(colors) == len(line))
-
-    def _calculate_line_score(self, row, col, axis_idx):
-        (dr1, dc1), (dr2, dc2) = self.AXES[axis_idx]
-        positions = {(row, col)}
-
-        r, c = row + dr1, col + dc1
-        while self.grid.is_valid_position(r, c) and self.grid.get(r, c):
-            positions.add((r, c))
-            r += dr1; c += dc1
-
-        r, c = row + dr2, col + dc2
-        while self.grid.is_valid_position(r, c) and self.grid.get(r, c):
-            positions.add((r, c))
-            r += dr2; c += dc2
-
-        return len(positions), positions
\ No newline at end of file
@@ -10,9 +10,9 @@ from ai import QwirkleAI
 from ui import HumanUI  # GUI wrapper for human moves
 
 # Constants for GUI dimensions
-CELL_SIZE = 100
-BOARD_ROWS = 6
-BOARD_COLS = 6
+BOARD_ROWS = int(os.environ.get("QWIRKLE_GRID_SIZE", 6))
+BOARD_COLS = BOARD_ROWS
+CELL_SIZE = max(20, min(100, 600 // BOARD_COLS))
 HEX_RADIUS = CELL_SIZE // 2
 BOARD_WIDTH = BOARD_COLS * CELL_SIZE
 BOARD_HEIGHT = BOARD_ROWS * CELL_SIZE
@@ -35,13 +35,15 @@ def draw_hexagon_at(surface, x, y, radius, fill_color, outline_color=(0,0,0)):
     pygame.draw.polygon(surface, outline_color, points, 2)
 
 class Game:
-    def __init__(self, num_humans=1, num_ai=1, ai_difficulty="hard", rows=6, cols=6):
+    def __init__(self, num_humans=1, num_ai=1, ai_difficulty="hard", rows=BOARD_ROWS, cols=BOARD_COLS):
         pygame.init()
         self.screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
         pygame.display.set_caption("Qwirkle GUI")
         self.font_small = pygame.font.SysFont(None, 28)
 
         self.board = Board(rows, cols)
+        self.powerup_sound = pygame.mixer.Sound("powerup_sound.mp3")
+        self.board.add_hook("powerup", lambda **_: self.powerup_sound.play())
         self.bag_of_tiles = []
         self.players = []
         self._generate_bag_of_tiles()
@@ -74,8 +76,8 @@ class Game:
             player.tiles.append(self.bag_of_tiles.pop())
 
     def check_for_dead_end(self):
-        human_moves = self.board.get_valid_moves(self.players[0].tiles)
-        ai_moves = self.board.get_valid_moves(self.players[1].tiles)
+        human_moves = self.board.get_rack_moves(self.players[0].tiles)
+        ai_moves = self.board.get_rack_moves(self.players[1].tiles)
 
         if not human_moves and not ai_moves:
             print("No valid moves left for both players. Game Over!")
@@ -124,7 +126,7 @@ class Game:
                         break
 
                 # After AI's turn, check if it has valid moves
-                if not self.board.get_valid_moves(player.get_tiles()):
+                if not self.board.get_rack_moves(player.get_tiles()):
                     # AI has no valid moves, so it will swap tiles
                     if len(player.get_tiles()) == 6:  # Only swap if AI has all 6 tiles
                         print("AI has no valid moves, swapping tiles...")
@@ -1,7 +1,18 @@
 import math
+from piece import Piece
 
 
 
+class _CellTables:
+    # Neighbor and axis-step tuples for one (rows, cols) size, by cell index.
+    # Filled per cell on first use, so they grow with the cells a game touches
+    # rather than the board area, and shared by every grid of that size.
+    def __init__(self):
+        self.neighbors = {}
+        self.adjacent = {}
+        self.steps = {}
+
+
 class HexGrid:
 
     CUBE_DIRS = [
@@ -9,16 +20,57 @@ class HexGrid:
         (-1, +1,  0), (-1,  0, +1), ( 0, -1, +1),
     ]
 
+    # line axes as (side 0, side 1) offset steps; Board walks lines along these
+    AXES = [
+        (( 0, -1), ( 0,  1)),
+        ((-1,  1), ( 1, -1)),
+        ((-1,  0), ( 1,  0)),
+    ]
+
+    _TABLES = {}
+
+    # methods instrumentation.py counts and times while it is enabled (subclass overrides included)
+    INSTRUMENTED = ('get_neighbors', 'get_adjacent', 'get_steps', 'clone', '__deepcopy__', 'is_empty',
+                    'get_empty_cells', 'get_occupied_cells')
+
     def __init__(self, rows, cols, hex_spacing_x, hex_height, hex_radius, grid_x, grid_y):
         self.rows       = rows
         self.cols       = cols
-        self.grid       = [[None]*cols for _ in range(rows)]
+        self._init_cells()
+        self._tables = HexGrid._tables_for(rows, cols)
         self.HEX_SPACING_X = hex_spacing_x
         self.HEX_HEIGHT    = hex_height
         self.HEX_RADIUS    = hex_radius
         self.GRID_X        = grid_x
         self.GRID_Y        = grid_y
 
+    def _init_cells(self):
+        self.grid = [[None]*self.cols for _ in range(self.rows)]
+
+    def clone(self):
+        # tiles are never mutated once placed, so rows can share them
+        new = object.__new__(type(self))
+        new.__dict__.update(self.__dict__)
+        new.grid = [row[:] for row in self.grid]
+        return new
+
+    def __getstate__(self):
+        # the neighbor/ray tables are shared per size, so they are looked up again instead of copied
+        state = self.__dict__.copy()
+        del state['_tables']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._tables = HexGrid._tables_for(self.rows, self.cols)
+
+    @staticmethod
+    def _tables_for(rows, cols):
+        tables = HexGrid._TABLES.get((rows, cols))
+        if tables is None:
+            tables = HexGrid._TABLES[(rows, cols)] = _CellTables()
+        return tables
+
     @staticmethod
     def _axial_to_cube(q, r):
         x = q; z = r; y = -x - z
@@ -29,6 +81,40 @@ class HexGrid:
         return x, z
 
     def get_neighbors(self, row, col):
+        if not self.is_valid_position(row, col):
+            return tuple(self._compute_neighbors(row, col))
+        i = row*self.cols + col
+        nbrs = self._tables.neighbors.get(i)
+        if nbrs is None:
+            nbrs = self._tables.neighbors[i] = tuple(self._compute_neighbors(row, col))
+        return nbrs
+
+    def get_adjacent(self, row, col):
+        """Hex neighbors plus every get_steps cell, without repeats."""
+        i = row*self.cols + col
+        adj = self._tables.adjacent.get(i)
+        if adj is None:
+            cells = list(self.get_neighbors(row, col))
+            for step in self.get_steps(row, col):
+                if step and step not in cells:
+                    cells.append(step)
+            adj = self._tables.adjacent[i] = tuple(cells)
+        return adj
+
+    def get_steps(self, row, col):
+        """The cell next to (row, col) along each AXES[axis][side], at 2*axis + side; None at the board edge."""
+        i = row*self.cols + col
+        steps = self._tables.steps.get(i)
+        if steps is None:
+            cells = []
+            for side_steps in self.AXES:
+                for dr, dc in side_steps:
+                    r, c = row + dr, col + dc
+                    cells.append((r, c) if self.is_valid_position(r, c) else None)
+            steps = self._tables.steps[i] = tuple(cells)
+        return steps
+
+    def _compute_neighbors(self, row, col):
         # 1) convert odd‑q to “true” axial
         q = col
         r = row - (col - (col & 1)) // 2
@@ -70,6 +156,9 @@ class HexGrid:
     def get_empty_cells(self):
         return [(r, c) for r in range(self.rows) for c in range(self.cols) if self.grid[r][c] is None]
 
+    def get_occupied_cells(self):
+        return [(r, c) for r in range(self.rows) for c in range(self.cols) if self.grid[r][c] is not None]
+
     # def get_neighbors(self, r, c):
     #     """
     #     Return the six neighbors for odd‑q flat‑topped hex layout.
@@ -172,4 +261,96 @@ class HexGrid:
         # cube → odd‐q vertical offset
         c = x
         r = z + (x - (x & 1)) // 2
-        return r, c
\ No newline at end of file
+        return r, c
+
+
+class CompactHexGrid(HexGrid):
+    """
+    Drop-in HexGrid backend that keeps every cell as one byte in a flat
+    bytearray (row-major): 0 for empty, Piece.id + 1 otherwise. Cloning is a
+    single buffer copy.
+    """
+
+    def _init_cells(self):
+        self.cells = bytearray(self.rows * self.cols)
+
+    def clone(self):
+        new = object.__new__(type(self))
+        new.__dict__.update(self.__dict__)
+        new.cells = self.cells[:]
+        return new
+
+    def __deepcopy__(self, memo):
+        return self.clone()
+
+    def is_empty(self):
+        return not any(self.cells)
+
+    def is_occupied(self, r, c):
+        return self.cells[r*self.cols + c] != 0
+
+    def place_tile(self, r, c, tile):
+        if self.is_valid_position(r, c):
+            self.cells[r*self.cols + c] = tile.id + 1 if tile else 0
+
+    def get(self, r, c):
+        if not self.is_valid_position(r, c):
+            return None
+        code = self.cells[r*self.cols + c]
+        return Piece.from_id(code - 1) if code else None
+
+    def get_empty_cells(self):
+        cols = self.cols
+        return [divmod(i, cols) for i, code in enumerate(self.cells) if not code]
+
+    def get_occupied_cells(self):
+        cols = self.cols
+        return [divmod(i, cols) for i, code in enumerate(self.cells) if code]
+
+
+class SparseHexGrid(HexGrid):
+    """
+    HexGrid backend that keeps only the occupied cells, in a dict from
+    (row, col) to tile. Cloning, is_empty and get_occupied_cells cost what
+    the tiles on the board cost, whatever the board size; only
+    get_empty_cells still walks every cell. Board uses it by default.
+    """
+
+    def _init_cells(self):
+        self.tiles = {}
+
+    def clone(self):
+        new = object.__new__(type(self))
+        new.__dict__.update(self.__dict__)
+        new.tiles = self.tiles.copy()
+        return new
+
+    def __deepcopy__(self, memo):
+        return self.clone()
+
+    def is_empty(self):
+        return not self.tiles
+
+    def is_occupied(self, r, c):
+        return (r, c) in self.tiles
+
+    def place_tile(self, r, c, tile):
+        if self.is_valid_position(r, c):
+            if tile:
+                self.tiles[(r, c)] = tile
+            else:
+                self.tiles.pop((r, c), None)
+
+    def get(self, r, c):
+        return self.tiles.get((r, c))
+
+    def get_empty_cells(self):
+        tiles = self.tiles
+        return [(r, c) for r in range(self.rows) for c in range(self.cols) if (r, c) not in tiles]
+
+    def get_occupied_cells(self):
+        return sorted(self.tiles)
+
+
+# backend names for the command line tools' --grid option
+GRIDS = {"sparse": SparseHexGrid, "list": HexGrid, "compact": CompactHexGrid}
@@ -0,0 +1,169 @@
+"""
+Opt-in call counters and timers for the rules engine.
+
+The methods listed in Board.INSTRUMENTED and HexGrid.INSTRUMENTED are swapped
+for counting wrappers only while instrumentation is enabled, and the
+originals are put back afterwards, so a disabled engine runs exactly the code
+it always did. Times are inclusive: place_piece's time contains the
+_validate_line calls it makes. Only this process is counted, so the hard
+search's pool workers (workers > 1) are not.
+
+    with instrumentation.capture() as report:
+        ai.choose_move(board)
+    print(report)
+    report.save("move.json")
+
+or, for one AI move on a seeded position:
+
+    python instrumentation.py --difficulty hard --size 6 --fill 0.3
+"""
+import argparse
+import functools
+import json
+import time
+from contextlib import contextmanager
+
+from board import Board
+from hexgrid import HexGrid, GRIDS
+
+# every grid backend, so whichever one a Board uses is counted
+CLASSES = (Board, HexGrid, *HexGrid.__subclasses__())
+
+# "Class.method" -> [calls, seconds], kept across enable/disable
+_stats = {}
+_originals = {}
+_enabled = 0
+
+
+def _timed(key, fn):
+    stat = _stats.setdefault(key, [0, 0.0])
+    clock = time.perf_counter
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = clock()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            stat[0] += 1
+            stat[1] += clock() - start
+    return wrapper
+
+
+def enable():
+    """Starts counting; calls nest, and only the outermost one patches the classes."""
+    global _enabled
+    _enabled += 1
+    if _enabled > 1:
+        return
+    for cls in CLASSES:
+        for name in cls.INSTRUMENTED:
+            fn = cls.__dict__.get(name)
+            if fn is not None:
+                _originals[cls, name] = fn
+                setattr(cls, name, _timed(f"{cls.__name__}.{name}", fn))
+
+
+def disable():
+    global _enabled
+    if _enabled == 0:
+        return
+    _enabled -= 1
+    if _enabled == 0:
+        for (cls, name), fn in _originals.items():
+            setattr(cls, name, fn)
+        _originals.clear()
+
+
+def is_enabled():
+    return _enabled > 0
+
+
+def reset():
+    for stat in _stats.values():
+        stat[0] = 0
+        stat[1] = 0.0
+
+
+def totals():
+    """Calls and seconds per method since the last reset(), as {key: (calls, seconds)}."""
+    return {key: (calls, seconds) for key, (calls, seconds) in _stats.items()}
+
+
+class Report:
+    """Calls and inclusive time per method over one capture() block."""
+
+    def __init__(self, stats=None):
+        self.stats = stats or {}
+
+    @classmethod
+    def between(cls, before, after):
+        stats = {}
+        for key, (calls, seconds) in after.items():
+            calls0, seconds0 = before.get(key, (0, 0.0))
+            if calls > calls0:
+                stats[key] = (calls - calls0, seconds - seconds0)
+        return cls(stats)
+
+    def calls(self, key):
+        return self.stats.get(key, (0, 0.0))[0]
+
+    def as_dict(self):
+        # busiest first
+        return {key: {"calls": calls, "seconds": seconds, "us_per_call": 1e6 * seconds / calls}
+                for key, (calls, seconds) in sorted(self.stats.items(), key=lambda kv: -kv[1][1])}
+
+    def to_json(self):
+        return json.dumps(self.as_dict(), indent=1)
+
+    def save(self, path):
+        with open(path, "w") as f:
+            f.write(self.to_json())
+
+    def __str__(self):
+        lines = [f"{'method':<34} {'calls':>9} {'ms':>10} {'us/call':>9}"]
+        for key, row in self.as_dict().items():
+            lines.append(f"{key:<34} {row['calls']:>9} {1000 * row['seconds']:>10.2f} {row['us_per_call']:>9.2f}")
+        return "\n".join(lines)
+
+
+@contextmanager
+def capture():
+    """Instruments the engine for the with block; the Report is filled in when it exits."""
+    report = Report()
+    enable()
+    before = totals()
+    try:
+        yield report
+    finally:
+        report.stats = Report.between(before, totals()).stats
+        disable()
+
+
+def main():
+    from ai import QwirkleAI
+    from benchmark import make_position
+
+    parser = argparse.ArgumentParser(description="Count and time engine calls for one AI move.")
+    parser.add_argument("--difficulty", default="hard")
+    parser.add_argument("--size", type=int, default=6)
+    parser.add_argument("--fill", type=float, default=0.3)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--grid", choices=sorted(GRIDS), default="sparse", help="board grid backend")
+    parser.add_argument("--json", help="write the report here")
+    args = parser.parse_args()
+
+    board, rack = make_position(args.size, args.fill, args.seed, grid_cls=GRIDS[args.grid])
+    ai = QwirkleAI(difficulty=args.difficulty, max_depth=args.depth, seed=args.seed, book=None)
+    ai.set_tiles(rack)
+    with capture() as report:
+        move = ai.choose_move(board)
+    print(f"move {move}")
+    print(report)
+    if args.json:
+        report.save(args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+NumPy-vectorized legality masks: for every cell, which of the 36 tile kinds the
+Board rules (adjacency + line cohesion) would accept there.
+
+legal_mask(board) returns a bool array of shape (rows, cols, 36) indexed by
+Piece.id, with the same answers as Board._is_adjacent_valid and
+Board._validate_line (i.e. Board.allowed_kinds). Like get_valid_moves, WILD
+power-up cells get no special treatment. legal_masks(boards) does the same for
+a batch of equally sized boards at once.
+
+NumPy is optional for the rest of the game; this module needs it.
+"""
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+from piece import COLOR_ORDER, SHAPE_ORDER, NUM_KINDS
+from hexgrid import HexGrid
+
+_NUM_SHAPES = len(SHAPE_ORDER)
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("legality masks need numpy (pip install numpy)")
+
+
+def board_codes(board):
+    """(rows, cols) int array of Piece.id per cell, -1 where empty."""
+    _require_numpy()
+    grid = board.grid
+    cells = getattr(grid, 'cells', None)
+    if cells is not None:
+        return np.frombuffer(bytes(cells), dtype=np.uint8).astype(np.int16).reshape(grid.rows, grid.cols) - 1
+    codes = np.full((grid.rows, grid.cols), -1, dtype=np.int16)
+    for r, c in grid.get_occupied_cells():
+        codes[r, c] = grid.get(r, c).id
+    return codes
+
+
+def legal_mask(board):
+    return legal_masks([board])[0]
+
+
+def legal_masks(boards):
+    """Bool array (len(boards), rows, cols, 36); every board must have the same size."""
+    _require_numpy()
+    codes = np.stack([board_codes(b) for b in boards])
+    n, rows, cols = codes.shape
+
+    kind_colors = np.arange(NUM_KINDS) // _NUM_SHAPES
+    kind_shapes = np.arange(NUM_KINDS) % _NUM_SHAPES
+    popcount = np.array([bin(i).count('1') for i in range(1 << max(len(COLOR_ORDER), _NUM_SHAPES))])
+
+    occupied = codes >= 0
+    ids = np.maximum(codes, 0)
+    color_bits = np.where(occupied, 1 << (ids // _NUM_SHAPES), 0)
+    shape_bits = np.where(occupied, 1 << (ids % _NUM_SHAPES), 0)
+
+    # --- adjacency: colors/shapes a kind may match, per cell ---
+    adj_colors = np.zeros_like(codes)
+    adj_shapes = np.zeros_like(codes)
+    anywhere = np.zeros(n, dtype=bool)
+    for b, board in enumerate(boards):
+        if board.current_turn_moves:
+            # only the hex neighbours of this turn's tiles, matching that tile
+            for pr, pc, placed in board.current_turn_moves:
+                cbit = 1 << (placed.id // _NUM_SHAPES)
+                sbit = 1 << (placed.id % _NUM_SHAPES)
+                for r, c in board.grid.get_neighbors(pr, pc):
+                    adj_colors[b, r, c] |= cbit
+                    adj_shapes[b, r, c] |= sbit
+        elif not occupied[b].any():
+            anywhere[b] = True
+        else:
+            for (dr1, dc1), (dr2, dc2) in HexGrid.AXES:
+                for dr, dc in ((dr1, dc1), (dr2, dc2)):
+                    adj_colors[b] |= _shift(color_bits[b], dr, dc, 0)
+                    adj_shapes[b] |= _shift(shape_bits[b], dr, dc, 0)
+    legal = (((adj_colors[..., None] >> kind_colors) & 1) | ((adj_shapes[..., None] >> kind_shapes) & 1)).astype(bool)
+    legal |= anywhere[:, None, None, None]
+    legal &= ~occupied[..., None]
+
+    # --- line cohesion along each axis, from the occupied runs on both sides ---
+    bypass = np.array([b.bypass_rules for b in boards])
+    for (dr1, dc1), (dr2, dc2) in HexGrid.AXES:
+        length = np.zeros_like(codes)
+        colors = np.zeros_like(codes)
+        shapes = np.zeros_like(codes)
+        for dr, dc in ((dr1, dc1), (dr2, dc2)):
+            alive = np.ones_like(occupied)
+            step = 1
+            while alive.any():
+                alive &= _shift(occupied, dr*step, dc*step, False)
+                length += alive
+                colors |= np.where(alive, _shift(color_bits, dr*step, dc*step, 0), 0)
+                shapes |= np.where(alive, _shift(shape_bits, dr*step, dc*step, 0), 0)
+                step += 1
+        same_color = ((popcount[colors] == 1) & (popcount[shapes] == length))[..., None]
+        same_shape = ((popcount[shapes] == 1) & (popcount[colors] == length))[..., None]
+        has_color = ((colors[..., None] >> kind_colors) & 1).astype(bool)
+        has_shape = ((shapes[..., None] >> kind_shapes) & 1).astype(bool)
+        fits = ((length == 0)[..., None] |
+                (same_color & has_color & ~has_shape) |
+                (same_shape & has_shape & ~has_color))
+        legal &= fits | bypass[:, None, None, None]
+    return legal
+
+
+def _shift(a, dr, dc, fill):
+    # out[..., r, c] = a[..., r + dr, c + dc], `fill` where that falls off the board
+    rows, cols = a.shape[-2:]
+    out = np.full_like(a, fill)
+    r0, r1 = max(0, -dr), min(rows, rows - dr)
+    c0, c1 = max(0, -dc), min(cols, cols - dc)
+    if r0 < r1 and c0 < c1:
+        out[..., r0:r1, c0:c1] = a[..., r0 + dr:r1 + dr, c0 + dc:c1 + dc]
+    return out
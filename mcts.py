@@ -0,0 +1,150 @@
+"""
+Determinized Monte Carlo Tree Search, used by QwirkleAI's "mcts" difficulty.
+
+Every iteration deals the tiles we can't see into a random opponent rack and
+bag order, walks the tree with UCB1 over the moves that are legal in that
+deal, adds one node, finishes with random one-tile turns up to a ply horizon
+and backs up who was ahead on points. Moves are (row, col, piece); None is a
+pass. The move played is the most visited child of the root.
+"""
+import math
+import random
+import time
+
+RACK_SIZE = 6
+PASS = None
+
+
+class Node:
+    __slots__ = ('move', 'parent', 'player', 'children', 'visits', 'wins', 'avail')
+
+    def __init__(self, move, parent, player):
+        self.move = move
+        self.parent = parent
+        self.player = player      # who played move: 0 is the searching side
+        self.children = {}
+        self.visits = 0
+        self.wins = 0.0
+        self.avail = 0            # iterations in which move was legal
+
+
+class MCTS:
+    def __init__(self, exploration=0.7, horizon=8, rng=None, opening_radius=None):
+        self.exploration = exploration
+        self.horizon = horizon
+        self.rng = rng or random.Random()
+        # passed to Board.get_rack_moves
+        self.opening_radius = opening_radius
+
+    def search(self, board, rack, unseen, move_ok=None, iterations=1000, time_ms=None, stop=None):
+        """
+        Best move for the side holding `rack`, with `unseen` (Counter of the
+        tiles it can't see) dealt at random every iteration. move_ok(r, c, board)
+        further filters our own moves. Stops after `iterations` or `time_ms`,
+        whichever comes first, or once stop() is true; returns (move, stats),
+        with the first legal move when no iteration finished and None only when
+        there is no legal move.
+        """
+        start = time.perf_counter()
+        deadline = start + time_ms / 1000 if time_ms is not None else None
+        board = board.clone()
+        self.move_ok = move_ok
+        root = Node(None, None, 1)
+        unseen = list(unseen.elements())
+        moves = self._moves(board, rack, 0)
+        if not moves:
+            return None, {"iterations": 0, "playouts_per_sec": 0.0, "elapsed_ms": 0.0}
+
+        done = 0
+        while ((iterations is None or done < iterations) and (deadline is None or time.perf_counter() < deadline)
+               and not (stop and stop())):
+            self._iterate(board, root, rack, unseen)
+            done += 1
+
+        elapsed = time.perf_counter() - start
+        stats = {
+            "iterations": done,
+            "elapsed_ms": elapsed * 1000,
+            "playouts_per_sec": done / elapsed if elapsed > 0 else 0.0,
+        }
+        if not root.children:
+            return moves[0], stats
+        best = max(root.children.values(), key=lambda n: n.visits)
+        stats["visits"] = best.visits
+        stats["win_rate"] = best.wins / best.visits
+        return best.move, stats
+
+    def _iterate(self, board, root, rack, unseen):
+        rng = self.rng
+        deal = unseen[:]
+        rng.shuffle(deal)
+        racks = [list(rack), deal[:RACK_SIZE]]
+        bag = deal[RACK_SIZE:]
+        scores = [0, 0]
+        tokens = []
+        node = root
+        player = 0
+        passes = plies = 0
+
+        # selection and expansion
+        while plies < self.horizon and passes < 2:
+            moves = self._moves(board, racks[player], player) or [PASS]
+            untried = [m for m in moves if m not in node.children]
+            for m in moves:
+                if m in node.children:
+                    node.children[m].avail += 1
+            if untried:
+                move = rng.choice(untried)
+                child = node.children[move] = Node(move, node, player)
+                child.avail = 1
+            else:
+                child = max((node.children[m] for m in moves), key=self._ucb)
+            node = child
+            passes = self._play(board, node.move, player, racks, bag, scores, tokens, passes)
+            player = 1 - player
+            plies += 1
+            if untried:
+                break
+
+        # random playout
+        while plies < self.horizon and passes < 2:
+            moves = self._moves(board, racks[player], player)
+            move = rng.choice(moves) if moves else PASS
+            passes = self._play(board, move, player, racks, bag, scores, tokens, passes)
+            player = 1 - player
+            plies += 1
+
+        for token in reversed(tokens):
+            board.undo(token)
+
+        diff = scores[0] - scores[1]
+        result = 1.0 if diff > 0 else 0.0 if diff < 0 else 0.5
+        while node is not None:
+            node.visits += 1
+            node.wins += result if node.player == 0 else 1.0 - result
+            node = node.parent
+
+    def _ucb(self, node):
+        return node.wins / node.visits + self.exploration * math.sqrt(math.log(node.avail) / node.visits)
+
+    def _moves(self, board, rack, player):
+        moves = board.get_rack_moves(rack, self.opening_radius)
+        if player == 0 and self.move_ok:
+            moves = [m for m in moves if self.move_ok(m[0], m[1], board)]
+        # duplicate tiles in a rack are the same move
+        return list(dict.fromkeys((r, c, rack[i]) for r, c, i in moves))
+
+    def _play(self, board, move, player, racks, bag, scores, tokens, passes):
+        # one turn of one tile (or a pass), then the player draws; returns the pass count
+        if move is PASS:
+            tokens.append(board.apply_end_turn())
+            return passes + 1
+        r, c, piece = move
+        token = board.apply(move)
+        tokens.append(token)
+        scores[player] += token.earned
+        racks[player].remove(piece)
+        tokens.append(board.apply_end_turn())
+        if bag:
+            racks[player].append(bag.pop())
+        return 0
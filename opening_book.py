@@ -0,0 +1,249 @@
+"""
+Opening book: strong first moves for empty and near-empty boards, worked out
+offline by self-play with a deeper hard search and stored as JSON.
+
+Positions are keyed by board size and the power-ups within NEAR cells of
+the tiles on the board, then by those tiles and the rack, so power-ups far
+from play (all of them on an empty board) don't split the book between
+games. Book moves are searched with those other power-ups taken off the
+board, and only played when their cell holds none of them. Of equally good
+moves the book keeps the one nearest the centre. The rules treat all
+colors alike and all shapes alike, so both are relabeled to a canonical
+order first and one entry answers every recoloring of a position. Only turn
+starts with at most max_tiles tiles on the board are looked up.
+
+Regenerate the book with
+
+    python opening_book.py --games 200 --depth 3
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import time
+
+from piece import Piece, COLOR_ORDER, SHAPE_ORDER, full_bag
+
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "opening_book.json")
+MAX_TILES = 3
+RACK_SIZE = 6
+# power-ups this many steps (Board adjacency) from the tiles on the board are part of the key
+NEAR = 2
+
+
+def near_cells(board):
+    """The tiles on board and every cell within NEAR steps of them."""
+    near = set(board.grid.get_occupied_cells())
+    ring = near
+    for _ in range(NEAR):
+        ring = {cell for r, c in ring for cell in board.grid.get_adjacent(r, c)}.difference(near)
+        near |= ring
+    return near
+
+
+def layout_key(board, near):
+    pus = ";".join(f"{r},{c},{pu}" for (r, c), pu in sorted(board.powerup_cells.items()) if (r, c) in near)
+    return f"{board.rows}x{board.cols}|{pus}"
+
+
+def without_far_powerups(board, near):
+    """Copy of board without the power-ups outside near, for searching book moves."""
+    plain = board.clone()
+    for cell in list(plain.powerup_cells):
+        if cell not in near:
+            plain.clear_powerup(*cell)
+    return plain
+
+
+def canonical(board, rack):
+    """
+    (position key, color map, shape map) for the tiles on board plus rack.
+    Colors and shapes of board tiles are numbered in order of first appearance
+    (row-major); the rest are numbered so that the sorted rack of canonical
+    ids is smallest over every order of the free colors and of the free
+    shapes. The maps take a color/shape to its canonical index.
+    """
+    tiles = [(r, c, board.grid.get(r, c)) for r, c in board.grid.get_occupied_cells()]
+    colors, shapes = [], []
+    for _, _, tile in tiles:
+        if tile.color not in colors:
+            colors.append(tile.color)
+        if tile.shape not in shapes:
+            shapes.append(tile.shape)
+    free_colors = [color for color in COLOR_ORDER if color not in colors and any(p.color == color for p in rack)]
+    free_shapes = [shape for shape in SHAPE_ORDER if shape not in shapes and any(p.shape == shape for p in rack)]
+    nshapes = len(SHAPE_ORDER)
+
+    best = None
+    for order in itertools.permutations(free_colors):
+        cmap = {color: i for i, color in enumerate(colors + list(order))}
+        # the best shape order for these colors: free shapes by how many rack tiles
+        # of each canonical color they have, commonest first. Ids compare by color
+        # first, so this is the smallest key over every shape order (test_engine.py
+        # checks it by brute force). Shapes with equal counts give the same key in
+        # either order; they keep SHAPE_ORDER.
+        counts = {s: [0] * len(cmap) for s in free_shapes}
+        for p in rack:
+            if p.shape in counts:
+                counts[p.shape][cmap[p.color]] -= 1
+        smap = {shape: i for i, shape in enumerate(shapes + sorted(free_shapes, key=counts.get))}
+        ids = tuple(sorted(cmap[p.color]*nshapes + smap[p.shape] for p in rack))
+        if best is None or ids < best[0]:
+            best = (ids, cmap, smap)
+    ids, cmap, smap = best
+
+    placed = ";".join(f"{r},{c},{cmap[t.color]*nshapes + smap[t.shape]}" for r, c, t in tiles)
+    return f"{placed}|{','.join(map(str, ids))}", cmap, smap
+
+
+class OpeningBook:
+    def __init__(self, positions=None, max_tiles=MAX_TILES):
+        # layout key -> position key -> [row, col, canonical piece id]
+        self.positions = positions if positions is not None else {}
+        self.max_tiles = max_tiles
+
+    def __len__(self):
+        return sum(len(entries) for entries in self.positions.values())
+
+    @classmethod
+    def load(cls, path=BOOK_PATH):
+        """The book stored at path, or an empty one if there is no file."""
+        if not os.path.exists(path):
+            return cls()
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data["positions"], data.get("max_tiles", MAX_TILES))
+
+    def save(self, path=BOOK_PATH):
+        with open(path, "w") as f:
+            json.dump({"max_tiles": self.max_tiles, "positions": self.positions}, f, sort_keys=True, indent=0)
+
+    def covers(self, board):
+        # a turn start with few enough tiles on the board
+        return (not board.current_turn_moves and not board.double_score_enabled and not board.bypass_rules
+                and board.tile_count <= self.max_tiles)
+
+    def lookup(self, board, rack):
+        """Book move as (row, col, rack index), or None if the position is not in the book."""
+        if not self.covers(board):
+            return None
+        near = near_cells(board)
+        entries = self.positions.get(layout_key(board, near))
+        if not entries:
+            return None
+        key, cmap, smap = canonical(board, rack)
+        move = entries.get(key)
+        if move is None:
+            return None
+        r, c, piece_id = move
+        colors = {i: color for color, i in cmap.items()}
+        shapes = {i: shape for shape, i in smap.items()}
+        piece = Piece(colors[piece_id // len(SHAPE_ORDER)], shapes[piece_id % len(SHAPE_ORDER)])
+        # the move was searched without the power-ups outside the key, so not onto one of them
+        if (not board.grid.is_valid_position(r, c) or board.grid.is_occupied(r, c) or piece not in rack
+                or ((r, c) in board.powerup_cells and (r, c) not in near)):
+            return None
+        return (r, c, rack.index(piece))
+
+    def add(self, board, rack, move):
+        """Stores move, (row, col, rack index), for this position."""
+        key, cmap, smap = canonical(board, rack)
+        r, c, i = move
+        piece = rack[i]
+        entries = self.positions.setdefault(layout_key(board, near_cells(board)), {})
+        entries[key] = [r, c, cmap[piece.color]*len(SHAPE_ORDER) + smap[piece.shape]]
+
+
+_default_book = None
+
+
+def default_book():
+    """The book shipped next to this module, loaded once per process."""
+    global _default_book
+    if _default_book is None:
+        _default_book = OpeningBook.load()
+    return _default_book
+
+
+def central_move(ai, board, move):
+    """
+    Of the root moves worth as much as move, ai.choose_move_hard(board)'s
+    pick, the one nearest the centre. The search keeps the first of equal
+    moves in row-major order, which on an empty board is a corner.
+    """
+    value = ai.search_stats["value"]
+    r0, c0 = board.rows // 2, board.cols // 2
+    moves = [m for m in board.get_rack_moves(ai.tiles, ai.OPENING_RADIUS)
+             if ai._is_adjacent_valid(m[0], m[1], board)]
+    moves.sort(key=lambda m: (max(abs(m[0] - r0), abs(m[1] - c0)), abs(m[0] - r0) + abs(m[1] - c0)))
+    pool = ai.unseen_tiles(board)
+    for r, c, i in moves:
+        if (r, c, i) == move:
+            return move
+        # values are whole points, so a move reaches value in this window only if it ties
+        if ai._play(board, r, c, i, ai.tiles, pool, ai.max_depth, value - 1, value, True) >= value:
+            return (r, c, i)
+    return move
+
+
+def self_play(book, games, rows, cols, depth, seed):
+    """Plays games from empty boards, adding every covered turn start to book."""
+    from board import Board
+    from ai import QwirkleAI
+
+    rng = random.Random(seed)
+    added = 0
+    for _ in range(games):
+        random.seed(rng.random())
+        board = Board(rows, cols, 0, 0, 0, 0, 0)
+        bag = full_bag()
+        rng.shuffle(bag)
+        players = [QwirkleAI(name=f"book {k}", max_depth=depth, book=None) for k in range(2)]
+        for ai in players:
+            ai.tiles = [bag.pop() for _ in range(RACK_SIZE)]
+
+        turn = 0
+        while book.covers(board) and turn < 2 * book.max_tiles + 2:
+            ai = players[turn % 2]
+            # the book move doesn't see power-ups outside the key; the game then goes on as usual
+            plain = without_far_powerups(board, near_cells(board))
+            move = ai.choose_move_hard(plain)
+            if move is not None:
+                move = central_move(ai, plain, move)
+                book.add(plain, ai.tiles, move)
+                added += 1
+            while move is not None:
+                r, c, i = move
+                board.apply((r, c, ai.tiles.pop(i)))
+                move = ai.choose_move(board)
+            board.end_turn()
+            while len(ai.tiles) < RACK_SIZE and bag:
+                ai.tiles.append(bag.pop())
+            turn += 1
+    return added
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regenerate the opening book from self-play.")
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=6)
+    parser.add_argument("--cols", type=int, default=6)
+    parser.add_argument("--depth", type=int, default=3, help="hard search depth for book moves")
+    parser.add_argument("--max-tiles", type=int, default=MAX_TILES, help="largest board (in tiles) to cover")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--extend", action="store_true", help="add to the existing book instead of starting over")
+    parser.add_argument("--out", default=BOOK_PATH)
+    args = parser.parse_args()
+
+    book = OpeningBook.load(args.out) if args.extend else OpeningBook()
+    book.max_tiles = args.max_tiles
+    start = time.perf_counter()
+    added = self_play(book, args.games, args.rows, args.cols, args.depth, args.seed)
+    book.save(args.out)
+    print(f"{added} positions from {args.games} games in {time.perf_counter() - start:.1f}s; "
+          f"{len(book)} in {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -24,6 +24,12 @@ class SHAPES:
     STAR = '★'
     SPARKLE = '❈'
 
+COLOR_ORDER = [COLORS.RED, COLORS.YELLOW, COLORS.GREEN, COLORS.CYAN, COLORS.MAGENTA, COLORS.BLUE]
+SHAPE_ORDER = [SHAPES.TRIANGLE, SHAPES.DIAMOND, SHAPES.SQUARE, SHAPES.CIRCLE, SHAPES.STAR, SHAPES.SPARKLE]
+NUM_KINDS = len(COLOR_ORDER) * len(SHAPE_ORDER)
+# Har kind ke itne tiles bag mein hote hain (2 x 36 = 72 tiles).
+TILE_COPIES = 2
+
 class Piece:
     """
     Represents a single tile (Piece) in Qwirkle.
@@ -31,13 +37,56 @@ class Piece:
     
     Rule Implementation:
     - Har tile ka color aur shape unique combination hona chahiye.
+
+    Pieces are interned flyweights: Piece(color, shape) always returns the same
+    immutable instance for a kind, so equality, hashing and copying are cheap.
+    Har (color, shape) ka sirf ek hi object banta hai, copy bhi wahi object deta hai.
     """
-    def __init__(self, color, shape):
+    __slots__ = ('color', 'shape', 'id')
+    _interned = {}
+    _by_id = []
+
+    def __new__(cls, color, shape):
         """
         Constructor: Set karta hai tile ka color aur shape.
+        Returns the canonical instance for (color, shape); id is color*6 + shape
+        for the standard kinds.
+        """
+        piece = cls._interned.get((color, shape))
+        if piece is None:
+            piece = object.__new__(cls)
+            object.__setattr__(piece, 'color', color)
+            object.__setattr__(piece, 'shape', shape)
+            object.__setattr__(piece, 'id', len(cls._by_id))
+            cls._interned[(color, shape)] = piece
+            cls._by_id.append(piece)
+        return piece
+
+    @classmethod
+    def from_id(cls, piece_id):
         """
-        self.color = color
-        self.shape = shape
+        Returns the canonical piece for a small-int id.
+        """
+        return cls._by_id[piece_id]
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Piece is immutable")
+
+    def __eq__(self, other):
+        return self is other or (isinstance(other, Piece) and self.id == other.id)
+
+    def __hash__(self):
+        return self.id
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        # unpickling goes back through __new__ so worker processes share the canonical pieces
+        return (Piece, (self.color, self.shape))
 
     def __str__(self):
         """
@@ -51,3 +100,15 @@ class Piece:
         Representation method, simply same as __str__.
         """
         return self.__str__()
+
+
+# Standard 36 kinds get ids 0..35 in color-major order.
+ALL_PIECES = [Piece(color, shape) for color in COLOR_ORDER for shape in SHAPE_ORDER]
+
+
+def full_bag(copies=TILE_COPIES):
+    """
+    The unshuffled bag a game starts with: `copies` tiles of every kind (72).
+    Game shuru hone wala bag, bina shuffle ke: har kind ke `copies` tiles.
+    """
+    return [piece for _ in range(copies) for piece in ALL_PIECES]
@@ -0,0 +1,180 @@
+"""
+Incremental index of the maximal occupied runs ("segments") along each of the
+three Board.AXES. Board updates it on every placement and removal, so cohesion
+checks and line lengths are lookups instead of walks along the grid.
+"""
+from piece import COLOR_ORDER, SHAPE_ORDER, NUM_KINDS
+
+COLOR_BITS = {color: 1 << i for i, color in enumerate(COLOR_ORDER)}
+SHAPE_BITS = {shape: 1 << i for i, shape in enumerate(SHAPE_ORDER)}
+POPCOUNT = [bin(i).count('1') for i in range(1 << max(len(COLOR_ORDER), len(SHAPE_ORDER)))]
+
+# Sets of tile kinds as bitmasks over Piece.id (color*6 + shape).
+ALL_KINDS = (1 << NUM_KINDS) - 1
+COLOR_KINDS = [sum(1 << (c*len(SHAPE_ORDER) + s) for c in range(len(COLOR_ORDER)) if m >> c & 1
+                   for s in range(len(SHAPE_ORDER))) for m in range(1 << len(COLOR_ORDER))]
+SHAPE_KINDS = [sum(1 << (c*len(SHAPE_ORDER) + s) for s in range(len(SHAPE_ORDER)) if m >> s & 1
+                   for c in range(len(COLOR_ORDER))) for m in range(1 << len(SHAPE_ORDER))]
+
+
+def matching_kinds(piece):
+    # kinds sharing a color or a shape with piece
+    return COLOR_KINDS[COLOR_BITS[piece.color]] | SHAPE_KINDS[SHAPE_BITS[piece.shape]]
+
+
+def extension_kinds(length, colors, shapes):
+    # kinds that keep a cohesive line of `length` tiles cohesive when added to it
+    if length == 0:
+        return ALL_KINDS
+    kinds = 0
+    if POPCOUNT[colors] == 1 and POPCOUNT[shapes] == length:
+        kinds |= COLOR_KINDS[colors] & ~SHAPE_KINDS[shapes]
+    if POPCOUNT[shapes] == 1 and POPCOUNT[colors] == length:
+        kinds |= SHAPE_KINDS[shapes] & ~COLOR_KINDS[colors]
+    return kinds
+
+
+def is_cohesive(length, colors, shapes):
+    # a line of `length` tiles is cohesive when it has one color and all different
+    # shapes, or one shape and all different colors
+    if length <= 1:
+        return True
+    return ((POPCOUNT[colors] == 1 and POPCOUNT[shapes] == length) or
+            (POPCOUNT[shapes] == 1 and POPCOUNT[colors] == length))
+
+
+class LineSegment:
+    """
+    A maximal run of occupied cells on one axis, ordered from side 0 to side 1.
+    turn_tiles counts how many of its cells were placed this turn.
+    """
+    __slots__ = ('axis', 'cells', 'length', 'colors', 'shapes', 'turn_tiles')
+
+    def __init__(self, axis, cells, colors, shapes, turn_tiles=0):
+        self.axis = axis
+        self.cells = cells
+        self.length = len(cells)
+        self.colors = colors
+        self.shapes = shapes
+        self.turn_tiles = turn_tiles
+
+    @property
+    def start(self):
+        return self.cells[0]
+
+    @property
+    def end(self):
+        return self.cells[-1]
+
+    def __repr__(self):
+        return f"LineSegment(axis={self.axis}, {self.start}..{self.end}, length={self.length})"
+
+
+class SegmentIndex:
+    def __init__(self, rows, cols, num_axes):
+        self.cols = cols
+        self.num_axes = num_axes
+        # per axis: cell index -> segment, for occupied cells only
+        self.segments = [{} for _ in range(num_axes)]
+
+    def segment_at(self, axis, r, c):
+        return self.segments[axis].get(r*self.cols + c)
+
+    def neighbor_segments(self, grid, row, col, axis):
+        """Segments touching (row, col) on side 0 and side 1 of axis (None where empty)."""
+        segs = self.segments[axis]
+        steps = grid.get_steps(row, col)
+        before = steps[2*axis]
+        after = steps[2*axis + 1]
+        return [segs.get(before[0]*self.cols + before[1]) if before else None,
+                segs.get(after[0]*self.cols + after[1]) if after else None]
+
+    def line_through(self, grid, row, col, axis, piece):
+        """(length, colors, shapes) of the line piece would form at empty (row, col)."""
+        length = 1
+        colors = COLOR_BITS[piece.color]
+        shapes = SHAPE_BITS[piece.shape]
+        for seg in self.neighbor_segments(grid, row, col, axis):
+            if seg:
+                length += seg.length
+                colors |= seg.colors
+                shapes |= seg.shapes
+        return length, colors, shapes
+
+    def allowed_kinds(self, grid, row, col, axis):
+        """Kinds that may go on empty (row, col) without breaking the line on axis."""
+        length = colors = shapes = 0
+        for seg in self.neighbor_segments(grid, row, col, axis):
+            if seg:
+                length += seg.length
+                colors |= seg.colors
+                shapes |= seg.shapes
+        return extension_kinds(length, colors, shapes)
+
+    def add(self, grid, row, col, piece, pending=True):
+        # pending: the tile belongs to the current turn
+        for axis in range(self.num_axes):
+            before, after = self.neighbor_segments(grid, row, col, axis)
+            cells = [(row, col)]
+            colors = COLOR_BITS[piece.color]
+            shapes = SHAPE_BITS[piece.shape]
+            turn_tiles = 1 if pending else 0
+            if before:
+                cells = before.cells + cells
+                colors |= before.colors
+                shapes |= before.shapes
+                turn_tiles += before.turn_tiles
+            if after:
+                cells = cells + after.cells
+                colors |= after.colors
+                shapes |= after.shapes
+                turn_tiles += after.turn_tiles
+            self._assign(axis, LineSegment(axis, cells, colors, shapes, turn_tiles))
+
+    def remove(self, grid, row, col, pending_cells):
+        for axis in range(self.num_axes):
+            seg = self.segments[axis].pop(row*self.cols + col, None)
+            if seg is None:
+                continue
+            k = seg.cells.index((row, col))
+            for part in (seg.cells[:k], seg.cells[k+1:]):
+                if part:
+                    self._assign(axis, self._segment_from(grid, axis, part, pending_cells))
+
+    def clear_pending(self, cells):
+        # the turn ended: cells are no longer this turn's tiles
+        for r, c in cells:
+            for segs in self.segments:
+                seg = segs.get(r*self.cols + c)
+                if seg:
+                    seg.turn_tiles = 0
+
+    def mark_pending(self, cells):
+        # inverse of clear_pending, for cells that are tiles of the current turn again
+        for r, c in cells:
+            for segs in self.segments:
+                seg = segs.get(r*self.cols + c)
+                if seg:
+                    seg.turn_tiles += 1
+
+    def rebuild(self, grid, pending_cells=()):
+        for segs in self.segments:
+            segs.clear()
+        for r, c in grid.get_occupied_cells():
+            self.add(grid, r, c, grid.get(r, c), (r, c) in pending_cells)
+
+    def _segment_from(self, grid, axis, cells, pending_cells):
+        colors = shapes = turn_tiles = 0
+        for r, c in cells:
+            tile = grid.get(r, c)
+            colors |= COLOR_BITS[tile.color]
+            shapes |= SHAPE_BITS[tile.shape]
+            if (r, c) in pending_cells:
+                turn_tiles += 1
+        return LineSegment(axis, cells, colors, shapes, turn_tiles)
+
+    def _assign(self, axis, seg):
+        segs = self.segments[axis]
+        cols = self.cols
+        for r, c in seg.cells:
+            segs[r*cols + c] = seg
@@ -0,0 +1,160 @@
+"""
+Headless AI-vs-AI self-play: plays many seeded games over a process pool and
+reports games per second, thinking time per move for each difficulty and the
+score distributions.
+
+    python simulate.py --games 1000 --a hard --b medium --time-ms 50
+
+Game i uses seed --seed + i for the power-up layout, the bag order and the
+MCTS deals, so any single game can be replayed. Seats alternate who starts.
+A turn is QwirkleAI.take_turn, played with place_piece and scored with what
+it returns. The game ends when both players pass in a row, the board is full
+or after --max-turns turns.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from board import Board
+from ai import QwirkleAI
+from hexgrid import GRIDS
+from piece import full_bag
+
+RACK_SIZE = 6
+
+
+def play_game(seed, difficulties, size=6, depth=3, time_ms=None, iterations=1000, max_turns=200, grid="sparse"):
+    """
+    One game between difficulties[0] (seat A) and difficulties[1] (seat B) on
+    the grid backend named grid (a key of hexgrid.GRIDS). Returns a dict of
+    per-seat scores, tiles, turns and seconds spent choosing.
+    """
+    rng = random.Random(seed)
+    random.seed(seed)  # Board spawns power-ups with the global generator
+    board = Board(size, size, 0, 0, 0, 0, 0, grid_cls=GRIDS[grid])
+    bag = full_bag()
+    rng.shuffle(bag)
+    players = [QwirkleAI(name=f"AI {seat}", difficulty=d, max_depth=depth, time_ms=time_ms,
+                         iterations=iterations, seed=rng.random())
+               for seat, d in zip("AB", difficulties)]
+    for ai in players:
+        ai.set_tiles([bag.pop() for _ in range(RACK_SIZE)])
+
+    scores = [0, 0]
+    tiles = [0, 0]
+    turns = [0, 0]
+    think = [0.0, 0.0]
+    first = seed % 2
+    passes = turn = 0
+    while passes < 2 and turn < max_turns and not board.check_for_full_board():
+        seat = (first + turn) % 2
+        ai = players[seat]
+        start = time.perf_counter()
+        moves = ai.take_turn(board)
+        think[seat] += time.perf_counter() - start
+        for r, c, piece in moves:
+            scores[seat] += board.place_piece(r, c, piece)
+            ai.tiles.remove(piece)
+        board.end_turn()
+        while len(ai.tiles) < RACK_SIZE and bag:
+            ai.tiles.append(bag.pop())
+        tiles[seat] += len(moves)
+        turns[seat] += 1
+        passes = passes + 1 if not moves else 0
+        turn += 1
+    for ai in players:
+        ai.close()
+    return {"seed": seed, "first": first, "scores": scores, "tiles": tiles, "turns": turns, "think": think}
+
+
+def _play(job):
+    seed, options = job
+    return play_game(seed, **options)
+
+
+def summarize(results, difficulties, elapsed):
+    games = len(results)
+    report = {
+        "games": games,
+        "seconds": elapsed,
+        "games_per_sec": games / elapsed if elapsed > 0 else 0.0,
+        "results": {"A": sum(r["scores"][0] > r["scores"][1] for r in results),
+                    "B": sum(r["scores"][1] > r["scores"][0] for r in results),
+                    "draw": sum(r["scores"][0] == r["scores"][1] for r in results)},
+        "difficulties": {},
+    }
+    # a difficulty on both seats is summed over both
+    for d in dict.fromkeys(difficulties):
+        seats = [k for k in (0, 1) if difficulties[k] == d]
+        scores = [r["scores"][k] for r in results for k in seats]
+        tiles = sum(r["tiles"][k] for r in results for k in seats)
+        turns = sum(r["turns"][k] for r in results for k in seats)
+        think = sum(r["think"][k] for r in results for k in seats)
+        quartiles = statistics.quantiles(scores, n=4) if len(scores) > 1 else scores * 3
+        report["difficulties"][d] = {
+            "seats": "".join("AB"[k] for k in seats),
+            "ms_per_move": 1000 * think / tiles if tiles else 0.0,
+            "ms_per_turn": 1000 * think / turns if turns else 0.0,
+            "tiles_per_turn": tiles / turns if turns else 0.0,
+            "score_mean": statistics.mean(scores),
+            "score_stdev": statistics.pstdev(scores),
+            "score_min": min(scores),
+            "score_quartiles": quartiles,
+            "score_max": max(scores),
+        }
+    return report
+
+
+def print_report(report):
+    print(f"{report['games']} games in {report['seconds']:.1f}s, {report['games_per_sec']:.2f} games/s")
+    res = report["results"]
+    print(f"A wins {res['A']}, B wins {res['B']}, draws {res['draw']}")
+    print(f"{'difficulty':<10} {'seats':>5} {'ms/move':>9} {'ms/turn':>9} {'tiles/turn':>10} "
+          f"{'mean':>7} {'sd':>6} {'min':>4} {'q1':>6} {'median':>6} {'q3':>6} {'max':>4}")
+    for d, s in report["difficulties"].items():
+        q1, q2, q3 = s["score_quartiles"]
+        print(f"{d:<10} {s['seats']:>5} {s['ms_per_move']:>9.2f} {s['ms_per_turn']:>9.2f} {s['tiles_per_turn']:>10.2f} "
+              f"{s['score_mean']:>7.2f} {s['score_stdev']:>6.2f} {s['score_min']:>4} {q1:>6.1f} {q2:>6.1f} {q3:>6.1f} "
+              f"{s['score_max']:>4}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless AI-vs-AI self-play.")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--a", default="hard", help="difficulty of seat A")
+    parser.add_argument("--b", default="medium", help="difficulty of seat B")
+    parser.add_argument("--size", type=int, default=6, help="board rows and columns")
+    parser.add_argument("--depth", type=int, default=3, help="hard search depth")
+    parser.add_argument("--time-ms", type=int, default=None, help="per-move budget for hard, medium and mcts")
+    parser.add_argument("--iterations", type=int, default=1000, help="mcts iterations per move")
+    parser.add_argument("--max-turns", type=int, default=200)
+    parser.add_argument("--grid", choices=sorted(GRIDS), default="sparse", help="board grid backend")
+    parser.add_argument("--seed", type=int, default=0, help="game i is seeded with seed + i")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processes (1 plays in this one)")
+    parser.add_argument("--json", help="also write the report and every game's result here")
+    args = parser.parse_args()
+
+    difficulties = (args.a.lower(), args.b.lower())
+    options = {"difficulties": difficulties, "size": args.size, "depth": args.depth, "time_ms": args.time_ms,
+               "iterations": args.iterations, "max_turns": args.max_turns, "grid": args.grid}
+    jobs = [(args.seed + i, options) for i in range(args.games)]
+
+    start = time.perf_counter()
+    if args.workers <= 1:
+        results = [_play(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(args.workers) as pool:
+            results = list(pool.map(_play, jobs, chunksize=max(1, args.games // (4 * args.workers))))
+    report = summarize(results, difficulties, time.perf_counter() - start)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(dict(report, games_played=results), f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
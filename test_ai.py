@@ -0,0 +1,102 @@
+"""
+Tests for the hard search on seeded positions from benchmark.make_position.
+
+    python -m pytest -q test_ai.py
+"""
+import random
+
+from ai import QwirkleAI
+from benchmark import make_position
+from board import PowerUp
+
+
+def search(board, rack, **settings):
+    ai = QwirkleAI(book=None, **settings)
+    ai.set_tiles(list(rack))
+    move = ai.choose_move_hard(board)
+    return move, ai.search_stats["value"]
+
+
+def plain_minimax(ai, board, depth, maximizing, rack, pool):
+    # the value QwirkleAI._minimax defines, over every move: no pruning, ordering or table
+    if depth == 0:
+        return 0
+    tiles = rack if maximizing else [p for p, n in pool.items() if n]
+    moves = board.get_rack_moves(tiles, ai.OPENING_RADIUS)
+    if maximizing:
+        moves = [m for m in moves if ai._is_adjacent_valid(m[0], m[1], board)]
+    if not moves:
+        turn = board.apply_end_turn()
+        value = plain_minimax(ai, board, depth - 1, not maximizing, rack, pool)
+        board.undo(turn)
+        return value
+    values = []
+    for r, c, i in moves:
+        piece = tiles[i]
+        token = board.apply((r, c, piece))
+        gain = token.earned + ai.POWERUP_BONUS.get(token.powerup, 0)
+        turn = board.apply_end_turn()
+        if maximizing:
+            values.append(gain + plain_minimax(ai, board, depth - 1, False, tiles[:i] + tiles[i+1:], pool))
+        else:
+            pool[piece] -= 1
+            values.append(-gain + plain_minimax(ai, board, depth - 1, True, rack, pool))
+            pool[piece] += 1
+        board.undo(turn)
+        board.undo(token)
+    return max(values) if maximizing else min(values)
+
+
+def with_undo(seed, fill, count):
+    """Seeded position with UNDO power-ups on `count` of its frontier cells."""
+    board, rack = make_position(6, fill, seed)
+    cells = random.Random(seed).sample(sorted(board.frontier), count)
+    for r, c in cells:
+        board.set_powerup(r, c, PowerUp.UNDO)
+    return board, rack
+
+
+def test_transposition_table_with_undo_powerups():
+    # two orders of our tiles reach the same tiles with different history, so an
+    # UNDO takes off different tiles; the table used to hand one the other's value
+    board, rack = make_position(6, 0.25, 23)
+    for r, c in ((0, 1), (5, 1)):
+        board.set_powerup(r, c, PowerUp.UNDO)
+    assert search(board, rack, max_depth=4) == search(board, rack, max_depth=4, tt_size=0) == ((0, 1, 1), -5)
+
+    for seed in range(6):
+        board, rack = with_undo(seed, 0.2, 2)
+        assert search(board, rack, max_depth=3) == search(board, rack, max_depth=3, tt_size=0)
+
+
+def test_root_value_matches_plain_minimax():
+    for seed in range(4):
+        for fill in (0.1, 0.3):
+            board, rack = make_position(6, fill, seed)
+            # one instance for every depth, so entries of the shallower searches are around
+            ai = QwirkleAI(book=None)
+            ai.set_tiles(list(rack))
+            for depth in (1, 2, 3):
+                ai.max_depth = depth
+                if ai.choose_move_hard(board) is None:
+                    break
+                expected = plain_minimax(ai, board, depth, True, list(rack), ai.unseen_tiles(board))
+                assert ai.search_stats["value"] == expected
+
+
+def test_parallel_search_matches_sequential():
+    # ties go to the earliest root move in every mode, so the worker count never changes the answer
+    positions = [make_position(6, fill, seed) for seed in range(5) for fill in (0.1, 0.3)]
+    results = []
+    for workers in (0, 2, 3):
+        ai = QwirkleAI(max_depth=3, workers=workers, book=None)
+        found = []
+        try:
+            for board, rack in positions:
+                ai.set_tiles(list(rack))
+                ai.tt.clear()
+                found.append((ai.choose_move_hard(board), ai.search_stats["value"]))
+        finally:
+            ai.close()
+        results.append(found)
+    assert results[0] == results[1] == results[2]
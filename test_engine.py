@@ -0,0 +1,200 @@
+"""
+Randomized differential tests for the incremental Board engine. Scores, rack
+move generation, apply/undo and the NumPy legality masks are checked against
+plain rescans of the grid on random games over every grid backend.
+
+    python -m pytest -q test_engine.py
+"""
+import itertools
+import random
+
+import pytest
+
+from board import Board, InvalidMoveException, PowerUp
+from hexgrid import HexGrid, CompactHexGrid, SparseHexGrid
+from opening_book import canonical
+from piece import ALL_PIECES, COLOR_ORDER, SHAPE_ORDER, Piece
+
+SIZE = 6
+GRIDS = (HexGrid, CompactHexGrid, SparseHexGrid)
+POWERUPS = (PowerUp.UNDO, PowerUp.DOUBLE, PowerUp.WILD)
+
+
+def new_board(seed, grid_cls):
+    random.seed(seed)
+    board = Board(SIZE, SIZE, 0, 0, 0, 0, 0, grid_cls=grid_cls)
+    rng = random.Random(seed)
+    if rng.random() < 0.5:
+        # crowd the board so power-ups get hit often
+        for _ in range(SIZE):
+            board.set_powerup(rng.randrange(SIZE), rng.randrange(SIZE), rng.choice(POWERUPS))
+    return board, rng
+
+
+def pick_move(board, rng):
+    """A random legal (row, col, piece) for a random rack, or None. Half the time it is the
+    best scoring one, so long lines (and six-tile bonuses) come up."""
+    rack = rng.sample(ALL_PIECES, 6)
+    moves = board.get_rack_moves(rack)
+    if not moves:
+        return None
+    if rng.random() < 0.5:
+        r, c, i = max(moves, key=lambda m: board.placement_score(m[0], m[1]))
+    else:
+        r, c, i = rng.choice(moves)
+    return r, c, rack[i]
+
+
+def random_positions(seed, grid_cls, steps=40):
+    """Boards along a random game of legal tiles and turn ends."""
+    board, rng = new_board(seed, grid_cls)
+    for _ in range(steps):
+        move = pick_move(board, rng) if rng.random() < 0.8 else None
+        if move:
+            board.place_piece(*move)
+        else:
+            board.end_turn()
+            board.start_turn()
+        yield board, rng
+
+
+def rescan_score(board):
+    # the turn score as the original Board computed it, walking every line from scratch
+    grid = board.grid
+    total = 0
+    counted = set()
+    for row, col, _ in board.current_turn_moves:
+        for axis in board.AXES:
+            positions = {(row, col)}
+            for dr, dc in axis:
+                r, c = row + dr, col + dc
+                while grid.is_valid_position(r, c) and grid.get(r, c):
+                    positions.add((r, c))
+                    r += dr; c += dc
+            total += len(positions - counted)
+            counted |= positions
+            if len(positions) == 6:
+                total += 6
+    if board.double_score_enabled:
+        total *= 2
+    return total
+
+
+def snapshot(board):
+    cells = tuple(board.grid.get(r, c) for r in range(SIZE) for c in range(SIZE))
+    return (cells, sorted(board.powerup_cells.items()), list(board.current_turn_moves),
+            board.double_score_enabled, board.bypass_rules, list(board.history),
+            list(board._kept_moves), board.score_current_turn(), board.zobrist_hash)
+
+
+@pytest.mark.parametrize("grid_cls", GRIDS)
+def test_scores_match_rescan(grid_cls):
+    for seed in range(30):
+        board, rng = new_board(seed, grid_cls)
+        for _ in range(60):
+            if rng.random() < 0.2:
+                # any cell and tile, so rejected moves are covered too
+                r, c, piece = rng.randrange(SIZE), rng.randrange(SIZE), rng.choice(ALL_PIECES)
+            else:
+                r, c, piece = pick_move(board, rng) or (0, 0, ALL_PIECES[0])
+            before = rescan_score(board)
+            pu = board.get_powerup_at(r, c)
+            try:
+                earned = board.place_piece(r, c, piece)
+            except InvalidMoveException:
+                continue
+            if pu == PowerUp.UNDO:
+                assert earned == 0
+            else:
+                expected = rescan_score(board) - before
+                assert earned == (expected * 2 if pu == PowerUp.DOUBLE else expected)
+            assert board.score_current_turn() == rescan_score(board)
+            if rng.random() < 0.3:
+                board.end_turn()
+                board.start_turn()
+
+
+@pytest.mark.parametrize("grid_cls", GRIDS)
+def test_rack_moves_match_brute_force(grid_cls):
+    for seed in range(10):
+        for board, rng in random_positions(seed, grid_cls, steps=25):
+            rack = rng.sample(ALL_PIECES, 6)
+            expected = set()
+            for r in range(SIZE):
+                for c in range(SIZE):
+                    for i, piece in enumerate(rack):
+                        try:
+                            token = board.apply((r, c, piece))
+                        except InvalidMoveException:
+                            continue
+                        board.undo(token)
+                        expected.add((r, c, i))
+            assert set(board.get_rack_moves(rack)) == expected
+
+
+@pytest.mark.parametrize("grid_cls", GRIDS)
+def test_undo_restores_state_and_hash(grid_cls):
+    for seed in range(20):
+        for board, rng in random_positions(seed, grid_cls):
+            stack = []
+            for _ in range(rng.randrange(1, 4)):
+                before = snapshot(board)
+                if rng.random() < 0.2:
+                    stack.append((before, board.apply_end_turn()))
+                    continue
+                move = pick_move(board, rng)
+                if move:
+                    stack.append((before, board.apply(move)))
+            for before, token in reversed(stack):
+                board.undo(token)
+                assert snapshot(board) == before
+
+
+@pytest.mark.parametrize("grid_cls", GRIDS)
+def test_legal_mask_matches_allowed_kinds(grid_cls):
+    pytest.importorskip("numpy")
+    from legality import legal_mask
+
+    for seed in range(10):
+        for board, _ in random_positions(seed, grid_cls, steps=25):
+            mask = legal_mask(board)
+            for r in range(SIZE):
+                for c in range(SIZE):
+                    kinds = 0 if board.grid.is_occupied(r, c) else board.allowed_kinds(r, c)
+                    assert [bool(kinds >> k & 1) for k in range(mask.shape[2])] == mask[r, c].tolist()
+
+
+def brute_force_rack_ids(board, rack):
+    # smallest sorted rack of canonical ids over every order of the free colors and free shapes
+    tiles = [board.grid.get(r, c) for r, c in board.grid.get_occupied_cells()]
+    colors = list(dict.fromkeys(t.color for t in tiles))
+    shapes = list(dict.fromkeys(t.shape for t in tiles))
+    free_colors = {p.color for p in rack}.difference(colors)
+    free_shapes = {p.shape for p in rack}.difference(shapes)
+    best = None
+    for color_order in itertools.permutations(free_colors):
+        cmap = {color: i for i, color in enumerate(colors + list(color_order))}
+        for shape_order in itertools.permutations(free_shapes):
+            smap = {shape: i for i, shape in enumerate(shapes + list(shape_order))}
+            ids = tuple(sorted(cmap[p.color]*len(SHAPE_ORDER) + smap[p.shape] for p in rack))
+            if best is None or ids < best:
+                best = ids
+    return best
+
+
+def test_book_key_is_smallest_over_every_relabeling():
+    rng = random.Random(0)
+    for seed in range(10):
+        for board, _ in random_positions(seed, SparseHexGrid, steps=4):
+            # few colors and shapes, so ties between shapes come up and the brute force stays small
+            rack = [Piece(rng.choice(COLOR_ORDER[:4]), rng.choice(SHAPE_ORDER[:4])) for _ in range(6)]
+            key = canonical(board, rack)[0]
+            assert key.split("|")[1] == ",".join(map(str, brute_force_rack_ids(board, rack)))
+
+            colors = dict(zip(COLOR_ORDER, rng.sample(COLOR_ORDER, len(COLOR_ORDER))))
+            shapes = dict(zip(SHAPE_ORDER, rng.sample(SHAPE_ORDER, len(SHAPE_ORDER))))
+            relabel = lambda p: Piece(colors[p.color], shapes[p.shape])
+            other = Board(SIZE, SIZE, 0, 0, 0, 0, 0)
+            for r, c in board.grid.get_occupied_cells():
+                other.grid.place_tile(r, c, relabel(board.grid.get(r, c)))
+            assert canonical(other, [relabel(p) for p in rack])[0] == key
@@ -3,8 +3,10 @@ import pygame
 import sys
 import os
 import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from board import Board, InvalidMoveException, PowerUp
-from piece import Piece, COLORS, SHAPES
+from piece import Piece, COLORS, SHAPES, full_bag
 from ai import QwirkleAI
 import random
 
@@ -12,8 +14,9 @@ import random
 
 
 # --- Constants ---
-GRID_SIZE = 6
-CELL_SIZE = 80
+# board rows and columns; set QWIRKLE_GRID_SIZE for a bigger board (cells shrink to fit)
+GRID_SIZE = int(os.environ.get("QWIRKLE_GRID_SIZE", 6))
+CELL_SIZE = max(20, min(80, 480 // GRID_SIZE))
 BOARD_WIDTH = GRID_SIZE * CELL_SIZE
 BOARD_HEIGHT = GRID_SIZE * CELL_SIZE
 
@@ -31,6 +34,7 @@ RACK_X_OFFSET = 30
 HAND_X = 0
 MAX_RACK_SLOTS = 6
 MAX_RACK_WIDTH = MAX_RACK_SLOTS * CELL_SIZE + (MAX_RACK_SLOTS - 1) * TILE_GAP
+AI_TIME_MS = 1000  # search budget per AI move, keeps the window responsive
 
 
 import math
@@ -64,6 +68,7 @@ in_turn = False
 
 # --- Pygame Init ---
 pygame.init()
+pygame.mixer.init()
 infoObject = pygame.display.Info()
 screen_width = int(infoObject.current_w * 0.9)
 screen_height = int(infoObject.current_h * 0.9)
@@ -149,6 +154,7 @@ def toggle_fullscreen():
 
 # --- Sound ---
 invalid_move_sound = pygame.mixer.Sound("invalid_move.mp3")
+powerup_sound = pygame.mixer.Sound("powerup_sound.mp3")
 
 def get_ai_comment():
     comments = [
@@ -327,15 +333,13 @@ human_tiles = []
 ai_tiles    = []
 ai_name     = 'Ava'
 human_score = ai_score = 0
-ai_player   = QwirkleAI(name=ai_name, difficulty='hard', max_depth=3)
+ai_player   = QwirkleAI(name=ai_name, difficulty='hard', max_depth=3, time_ms=AI_TIME_MS)
 
 
 
 
 # --- Bag of Tiles (72) ---
-colors = [c.lower() for c in COLORS.__dict__ if c.isupper()]
-shapes = [s for k,s in SHAPES.__dict__.items() if k.isupper()]
-bag    = [Piece(color, shape) for _ in range(2) for color in colors for shape in shapes]
+bag = full_bag()
 random.shuffle(bag)
 
 
@@ -351,6 +355,7 @@ board = Board(
     grid_x=GRID_X,
     grid_y=GRID_Y
 )
+board.add_hook("powerup", lambda **_: powerup_sound.play())
 dragging       = False
 drag_tile      = None
 mouse_x = mouse_y = 0
@@ -437,14 +442,115 @@ def squareanimation(dt):
             pygame.draw.polygon(screen, c, points)
 
 
+# --- Background AI turn ---
+# The AI plans its whole turn on a worker thread (QwirkleAI.take_turn on a
+# board copy); the main loop polls the future every frame and then plays the
+# moves one by one, so events and drawing never stop during an AI turn.
+AI_MOVE_DELAY_MS = 500
+ai_executor = ThreadPoolExecutor(max_workers=1)
+ai_future   = None
+ai_cancel   = None
+ai_moves    = None   # moves still to show once the future is done
+ai_next_move_at = 0
+# pondering: during the human's turn the same worker precomputes AI replies
+ponder_cancel = None
+pondered_hash = None
+
+
+def update_pondering():
+    # (re)start pondering whenever the position changed during the human's turn
+    global ponder_cancel, pondered_hash
+    if ai_busy() or board.zobrist_hash == pondered_hash:
+        return
+    stop_pondering()
+    ponder_cancel = threading.Event()
+    pondered_hash = board.zobrist_hash
+    ai_executor.submit(ai_player.ponder, board.clone(), ponder_cancel)
+
+
+def stop_pondering():
+    global pondered_hash
+    if ponder_cancel is not None:
+        ponder_cancel.set()
+    pondered_hash = None
+
+
+def start_ai_turn():
+    global ai_future, ai_cancel, ai_moves
+    stop_pondering()
+    ai_cancel = threading.Event()
+    ai_moves = None
+    ai_future = ai_executor.submit(ai_player.take_turn, board.clone(), ai_cancel)
+
+
+def cancel_ai_turn():
+    global ai_future
+    if ai_future is not None:
+        ai_cancel.set()
+        ai_future = None
+
+
+def ai_busy():
+    return ai_future is not None or ai_moves is not None
+
+
+def finish_ai_turn():
+    global ai_score, in_turn, valid_moves
+    ai_score += board.score_current_turn()
+    board.end_turn()
+    board.start_turn()  # ← Preserve AI’s move state
+    # refill racks
+    while len(human_tiles) < 6 and bag:
+        human_tiles.append(bag.pop())
+    while len(ai_tiles) < 6 and bag:
+        ai_tiles.append(bag.pop())
+    ai_player.set_tiles(ai_tiles)
+    in_turn = False
+    valid_moves = []
+    update_layout()
+
+
+def step_ai_turn():
+    # once per frame: collect the finished search, then place one tile per AI_MOVE_DELAY_MS
+    global ai_future, ai_moves, ai_next_move_at
+    if ai_future is not None and ai_future.done():
+        ai_moves = ai_future.result() or []
+        ai_future = None
+        ai_next_move_at = pygame.time.get_ticks()
+    if ai_moves is None or pygame.time.get_ticks() < ai_next_move_at:
+        return
+    if ai_moves:
+        r, c, piece = ai_moves.pop(0)
+        try:
+            board.place_piece(r, c, piece)
+            ai_tiles.remove(piece)
+            ai_next_move_at = pygame.time.get_ticks() + AI_MOVE_DELAY_MS
+            return
+        except InvalidMoveException:
+            pass
+    ai_moves = None
+    finish_ai_turn()
+
+
+def quit_game():
+    stop_pondering()
+    cancel_ai_turn()
+    ai_executor.shutdown(wait=False, cancel_futures=True)
+    ai_player.close()
+    pygame.quit(); sys.exit()
+
+
 # --- Main Loop ---
 while True:
     dt = clock.tick(60) / 1000  # Convert milliseconds to seconds
+    if state == 'game':
+        step_ai_turn()
+        update_pondering()
 
 
     for ev in pygame.event.get():
         if ev.type == pygame.QUIT:
-            pygame.quit(); sys.exit()
+            quit_game()
         elif ev.type == pygame.USEREVENT:
              show_ai_message = False
              pygame.time.set_timer(pygame.USEREVENT, 0)
@@ -452,6 +558,10 @@ while True:
             WINDOW_WIDTH, WINDOW_HEIGHT = ev.w, ev.h
             screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.RESIZABLE)
             update_layout()
+            if ai_future is not None:
+                # drop the running search and start over on the worker
+                cancel_ai_turn()
+                start_ai_turn()
         elif ev.type == pygame.KEYDOWN and ev.key == pygame.K_f:
             toggle_fullscreen()
 
@@ -501,6 +611,8 @@ while True:
        
        
         elif state == 'game':
+            if ai_busy():
+                continue  # the AI is playing its turn
             # --- Draw Swap & End Turn Buttons ONLY if in the game state ---
             
             screen.blit(bag_img, swap_rect)
@@ -526,59 +638,9 @@ while True:
 
 
 
-                    # AI’s turn — animate each placement
+                    # AI’s turn — searched in the background, animated by step_ai_turn()
                     board.start_turn()
-                    while True:
-                       
-                        m = ai_player.choose_move(board)
-                        if not m: break
-                        r,c,i = m
-                        try:
-                            board.place_piece(r, c, ai_tiles[i])
-                            ai_tiles.pop(i)
-                            # redraw board instantly so user sees this move
-                            for r in range(GRID_SIZE):
-                                for c in range(GRID_SIZE):
-                                    fill = HIGHLIGHT if (r, c) in valid_moves else PAGE_BG
-                                    center_x, center_y = board.grid.get_hex_position(r, c)
-                                    draw_hexagon_at(screen, cx,cy, HEX_RADIUS+3, PAGE_BG,neon)
-                                    draw_hexagon_at(screen, cx,cy, HEX_RADIUS,HIGHLIGHT if (rr,cc) in valid_moves else PAGE_BG)
-
-
-                                    # draw power-up icon
-                                    pu = board.get_powerup_at(r, c)
-                                    if pu and pu in powerup_icons:
-                                        icon = powerup_icons[pu]
-                                        screen.blit(icon, icon.get_rect(center=(center_x, center_y)))
-
-
-
-
-                                    t = board.grid.get(r, c)
-                                    if t:
-                                        img = tiles_images.get((t.color.lower(), t.shape))
-                                        if img:
-                                            screen.blit(img, img.get_rect(center=(center_x, center_y)))
-
-
-                            pygame.display.flip()
-                            pygame.time.wait(500)
-                        except InvalidMoveException:
-                            break
-                    ai_score += board.score_current_turn()
-                    board.end_turn()
-                    board.start_turn()  # ← Preserve AI’s move state
-
-
-                    # refill racks
-                    while len(human_tiles) < 6 and bag:
-                        human_tiles.append(bag.pop())
-                    while len(ai_tiles) < 6 and bag:
-                        ai_tiles.append(bag.pop())
-                    ai_player.set_tiles(ai_tiles)
-                    in_turn = False
-                    valid_moves = []
-                    update_layout()
+                    start_ai_turn()
                     continue
 
 
@@ -593,52 +655,7 @@ while True:
                     board.end_turn()
                     board.start_turn()
                     show_ai_message = False
-                    while True:
-                        m = ai_player.choose_move(board)
-                        if not m: break
-                        r,c,i = m
-                        try:
-                            board.place_piece(r, c, ai_tiles[i])
-                            ai_tiles.pop(i)
-                            # ✅ hex‐cell draw
-                            for rr in range(GRID_SIZE):
-                                for cc in range(GRID_SIZE):
-                                    # white background for all AI redraws
-                                    cx, cy = board.grid.get_hex_position(rr, cc)
-                                    draw_hexagon_at(screen, cx,cy, HEX_RADIUS+3, PAGE_BG,neon)
-                                    draw_hexagon_at(screen, cx,cy, HEX_RADIUS,HIGHLIGHT if (rr,cc) in valid_moves else PAGE_BG)
-
-
-                                    # power‐up icon
-                                    pu = board.get_powerup_at(rr, cc)
-                                    if pu and pu in powerup_icons:
-                                        icon = powerup_icons[pu]
-                                        screen.blit(icon, icon.get_rect(center=(cx, cy)))
-
-
-                                    # tile image
-                                    t = board.grid.get(rr, cc)
-                                    if t:
-                                        img = tiles_images.get((t.color.lower(), t.shape))
-                                        if img:
-                                            screen.blit(img, img.get_rect(center=(cx, cy)))
-                            pygame.display.flip()
-                            pygame.time.wait(500)
-        
-                        except InvalidMoveException:
-                            break
-                    ai_score += board.score_current_turn()
-                    board.end_turn()
-                    board.start_turn()  # ← Preserve AI’s move state
-                    # refill racks
-                    while len(human_tiles) < 6 and bag:
-                        human_tiles.append(bag.pop())
-                    while len(ai_tiles) < 6 and bag:
-                        ai_tiles.append(bag.pop())
-                    ai_player.set_tiles(ai_tiles)
-                    in_turn = False
-                    valid_moves = []
-                    update_layout()
+                    start_ai_turn()
                     continue
                 elif ev.type == pygame.USEREVENT:
                     print("USEREVENT triggered")
@@ -651,7 +668,7 @@ while True:
                     if rect.collidepoint(ev.pos):
                         selected_tile = (i, human_tiles[i])
                         click_x, click_y = ev.pos
-                        valid_moves = board.get_valid_moves(human_tiles[i])
+                        valid_moves = [(r, c) for r, c, j in board.get_rack_moves(human_tiles) if j == i]
                         break
 
 
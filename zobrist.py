@@ -0,0 +1,44 @@
+"""
+Deterministic 64-bit Zobrist keys for Board positions.
+Keys are a splitmix64 mix of a feature number, so every process computes the
+same keys and no per-board-size key tables are needed.
+"""
+
+MASK64 = (1 << 64) - 1
+
+# per-cell feature slots: piece ids, then power-ups, then the "placed this turn" marker
+_CELL_STRIDE = 128
+_POWERUP_BASE = 64
+_PENDING_SLOT = 127
+
+_keys = {}
+
+
+def _splitmix64(x):
+    x = (x + 0x9E3779B97F4A7C15) & MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
+
+
+def key(feature):
+    k = _keys.get(feature)
+    if k is None:
+        k = _keys[feature] = _splitmix64(feature)
+    return k
+
+
+def piece_key(cell_index, piece):
+    return key(cell_index*_CELL_STRIDE + piece.id)
+
+
+def powerup_key(cell_index, slot):
+    return key(cell_index*_CELL_STRIDE + _POWERUP_BASE + slot)
+
+
+def pending_key(cell_index):
+    return key(cell_index*_CELL_STRIDE + _PENDING_SLOT)
+
+
+DOUBLE_SCORE_KEY = _splitmix64(MASK64 - 1)
+BYPASS_RULES_KEY = _splitmix64(MASK64 - 2)